@@ -18,85 +18,1762 @@ Execução local:
 from __future__ import annotations
 
 import os
-import json
+import re
+import argparse
+import asyncio
+import functools
+import hashlib
+import math
+import socket
+import sys
+import threading
+import time
+import zipfile
+import zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager, nullcontext
 from datetime import datetime, timedelta
-from typing import Any, Dict, Optional, Tuple
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+from urllib.parse import urlsplit
 
+import httpx
+import numpy as np
+import orjson
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
 import requests
 import streamlit as st
 import yfinance as yf
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import NewConnectionError
+from urllib3.util.retry import Retry
+from pandas.tseries.holiday import (
+    AbstractHolidayCalendar,
+    GoodFriday,
+    Holiday,
+    USLaborDay,
+    USMartinLutherKingJr,
+    USMemorialDay,
+    USPresidentsDay,
+    USThanksgivingDay,
+    nearest_workday,
+    sunday_to_monday,
+)
+from pandas.tseries.offsets import CustomBusinessDay
+
+try:  # POSIX: lock entre processos para o cache em disco
+    import fcntl
+except ImportError:  # pragma: no cover – Windows: cache funciona, mas sem exclusão entre processos
+    fcntl = None  # type: ignore[assignment]
 
 # ============================
 # Configuração básica do app
 # ============================
 DEFAULT_API_URL = os.getenv("API_BASE_URL", "http://127.0.0.1:8000")
+
+# Pool de conexões HTTP (keep-alive) compartilhado pelo processo
+API_POOL_CONNECTIONS = int(os.getenv("API_POOL_CONNECTIONS", "10"))  # nº de hosts com pool mantido
+API_POOL_MAXSIZE = int(os.getenv("API_POOL_MAXSIZE", "20"))  # conexões por host
+API_MAX_RETRIES = int(os.getenv("API_MAX_RETRIES", "2"))
+API_BACKOFF_FACTOR = float(os.getenv("API_BACKOFF_FACTOR", "0.3"))
+
+# Cache em disco do histórico OHLCV (compartilhado entre sessões/processos/restarts)
+RAW_DIR = os.getenv("RAW_DIR", "./data/raw")
+YF_CACHE_TTL_SECONDS = int(os.getenv("YF_CACHE_TTL_SECONDS", "3600"))
+
+# Fonte do histórico OHLCV: yahoo | local | synthetic (ver `get_history_provider`)
+HISTORY_PROVIDER = os.getenv("HISTORY_PROVIDER", "yahoo")
+HISTORY_LOCAL_DIR = os.getenv("HISTORY_LOCAL_DIR", RAW_DIR)
+SYNTHETIC_SEED = int(os.getenv("SYNTHETIC_SEED", "42"))
+
+# Cache de respostas do /predict (memória + disco), invalidado quando o modelo muda
+PREDICT_CACHE_DIR = os.getenv("PREDICT_CACHE_DIR", "./data/cache/predict")
+PREDICT_CACHE_SIZE = int(os.getenv("PREDICT_CACHE_SIZE", "512"))  # entradas na LRU em memória
+PREDICT_CACHE_MAX_AGE = int(os.getenv("PREDICT_CACHE_MAX_AGE", str(7 * 24 * 3600)))  # s até um JSON do disco expirar
+
+# Artefatos do modelo para a inferência em processo (mesmos caminhos do backend)
+MODEL_H1_PATH = os.getenv("MODEL_H1_PATH", "./models/model_h1.h5")
+MODEL_H5_PATH = os.getenv("MODEL_H5_PATH", "./models/model_h5.h5")
+SCALER_PATH = os.getenv("SCALER_PATH", "./models/scaler.joblib")
+METADATA_PATH = os.getenv("METADATA_PATH", "./models/metadata.json")
+INFERENCE_ENGINE = os.getenv("INFERENCE_ENGINE", "numpy")  # numpy (sem TensorFlow) | keras
+INFERENCE_BATCH_SIZE = int(os.getenv("INFERENCE_BATCH_SIZE", "512"))  # janelas por forward no lote
+
 st.set_page_config(page_title="Tech Challenge F4 – LSTM Forecast", layout="wide")
 
 
+# ============================
+# Coalescência de chamadas idênticas em andamento
+# ============================
+class _Flight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Uma chamada por chave em andamento; quem chega durante ela espera e recebe o mesmo resultado.
+
+    Funciona entre as threads de script das sessões do Streamlit (instância única por
+    processo via `single_flight()`). Exceções do líder são repassadas a todos; nada fica
+    guardado depois que a chamada termina – isso é papel dos caches.
+    """
+
+    def __init__(self) -> None:
+        self._flights: Dict[Tuple[Any, ...], _Flight] = {}
+        self._guard = threading.Lock()
+
+    def do(self, key: Tuple[Any, ...], fn: Callable[[], Any]) -> Any:
+        with self._guard:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = fn()
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._guard:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result
+
+
+@st.cache_resource(show_spinner=False)
+def single_flight() -> SingleFlight:
+    return SingleFlight()
+
+
+# ============================
+# Histogramas de latência (visão do cliente)
+# ============================
+LATENCY_MIN_S = 1e-4  # limite superior do 1º bucket (100µs)
+LATENCY_BUCKETS_PER_DECADE = 20  # buckets log fixos: erro relativo ≤ ~12% por percentil
+LATENCY_DECADES = 6  # 100µs … 100s; acima disso tudo cai no último bucket (o máximo é exato)
+LATENCY_SLOT_SECONDS = 5  # granularidade das janelas deslizantes
+LATENCY_WINDOWS = {"1 min": 60, "5 min": 300, "15 min": 900}
+
+_LATENCY_N_BUCKETS = LATENCY_BUCKETS_PER_DECADE * LATENCY_DECADES + 1
+_LATENCY_UPPER = LATENCY_MIN_S * 10 ** (np.arange(1, _LATENCY_N_BUCKETS + 1) / LATENCY_BUCKETS_PER_DECADE)
+
+
+def latency_bucket(seconds: float) -> int:
+    """Índice do bucket log de `seconds` (bucket i cobre até `_LATENCY_UPPER[i]`)."""
+    if seconds <= LATENCY_MIN_S:
+        return 0
+    return min(int(math.log10(seconds / LATENCY_MIN_S) * LATENCY_BUCKETS_PER_DECADE), _LATENCY_N_BUCKETS - 1)
+
+
+class _LatencySlot:
+    __slots__ = ("start", "counts", "errors", "max")
+
+    def __init__(self, start: float) -> None:
+        self.start = start
+        self.counts = np.zeros(_LATENCY_N_BUCKETS, dtype=np.int64)
+        self.errors = 0
+        self.max = 0.0
+
+
+class LatencyRecorder:
+    """Histogramas de latência por endpoint em janelas deslizantes (memória do processo).
+
+    O tempo é fatiado em `LATENCY_SLOT_SECONDS`; cada fatia guarda contagens nos buckets
+    log, nº de erros e o máximo. Registrar é O(1); uma janela soma as fatias recentes.
+    """
+
+    def __init__(self, horizon_s: int = max(LATENCY_WINDOWS.values()), slot_s: int = LATENCY_SLOT_SECONDS) -> None:
+        self._slot_s = slot_s
+        self._series: Dict[str, Deque[_LatencySlot]] = {}
+        self._maxlen = math.ceil(horizon_s / slot_s) + 1
+        self._guard = threading.Lock()
+
+    def record(self, endpoint: str, seconds: float, error: bool, now: Optional[float] = None) -> None:
+        now = time.monotonic() if now is None else now
+        start = now - now % self._slot_s
+        with self._guard:
+            slots = self._series.setdefault(endpoint, deque(maxlen=self._maxlen))
+            if not slots or slots[-1].start != start:
+                slots.append(_LatencySlot(start))
+            slot = slots[-1]
+            slot.counts[latency_bucket(seconds)] += 1
+            slot.errors += int(error)
+            slot.max = max(slot.max, seconds)
+
+    def summary(self, window_s: int, now: Optional[float] = None) -> pd.DataFrame:
+        """p50/p90/p99/máx (ms), % de erros e vazão (req/s) por endpoint na janela."""
+        now = time.monotonic() if now is None else now
+        rows: List[Dict[str, Any]] = []
+        with self._guard:
+            for endpoint, slots in sorted(self._series.items()):
+                recent = [s for s in slots if s.start + self._slot_s > now - window_s]
+                if not recent:
+                    continue
+                counts = np.sum([s.counts for s in recent], axis=0)
+                n = int(counts.sum())
+                peak = max(s.max for s in recent)
+                cum = np.cumsum(counts)
+                row: Dict[str, Any] = {"endpoint": endpoint, "n": n}
+                for q in (50, 90, 99):
+                    idx = int(np.searchsorted(cum, q / 100 * n))
+                    row[f"p{q}_ms"] = round(min(float(_LATENCY_UPPER[idx]), peak) * 1e3, 1)
+                row["max_ms"] = round(peak * 1e3, 1)
+                row["erros_%"] = round(100 * sum(s.errors for s in recent) / n, 1)
+                # Vazão sobre o trecho da janela com dados (no mínimo uma fatia)
+                span = max(min(window_s, now - recent[0].start), self._slot_s)
+                row["req_s"] = round(n / span, 2)
+                rows.append(row)
+        return pd.DataFrame(rows)
+
+
+@st.cache_resource(show_spinner=False)
+def latency_recorder() -> LatencyRecorder:
+    return LatencyRecorder()
+
+
+def _record_latency(url: str, result: Tuple[Any, float, Optional[str]]) -> None:
+    latency_recorder().record(urlsplit(url).path or "/", float(result[1]), result[2] is not None)
+
+
 # ============================
 # Helpers de requisição HTTP
 # ============================
+class RequestTiming(float):
+    """Tempo total da requisição em segundos (continua sendo um `float`) + decomposição por fase.
+
+    Fases, em segundos, medidas com `time.perf_counter`:
+    - `dns`, `connect`, `tls`: abertura de conexão (zeradas quando o keep-alive reaproveita uma);
+    - `ttfb`: do envio até o cabeçalho da resposta (rede + servidor/modelo, incluindo retries);
+    - `download`: leitura do corpo; `decode`: `orjson.loads` do corpo.
+    `bytes_out`/`bytes_in` contam o corpo enviado e recebido; `status`, o código HTTP da
+    resposta (0 quando nenhuma chegou: timeout, falha de conexão). `from_cache` indica resposta
+    servida pelo `PredictionCache`, sem ida à API; `in_process`, previsão feita pelo
+    `InProcessModel` neste processo (sem HTTP).
+    """
+
+    PHASES = ("dns", "connect", "tls", "ttfb", "download", "decode")
+
+    dns: float
+    connect: float
+    tls: float
+    ttfb: float
+    download: float
+    decode: float
+    bytes_out: int
+    bytes_in: int
+    status: int
+    reused_connection: bool
+    from_cache: bool
+    in_process: bool
+
+    def __new__(
+        cls,
+        seconds: float,
+        reused_connection: bool = False,
+        from_cache: bool = False,
+        in_process: bool = False,
+        bytes_out: int = 0,
+        bytes_in: int = 0,
+        status: int = 0,
+        **phases: float,
+    ) -> "RequestTiming":
+        obj = super().__new__(cls, seconds)
+        for name in cls.PHASES:
+            setattr(obj, name, max(float(phases.get(name, 0.0)), 0.0))
+        obj.bytes_out = bytes_out
+        obj.bytes_in = bytes_in
+        obj.status = status
+        obj.reused_connection = reused_connection
+        obj.from_cache = from_cache
+        obj.in_process = in_process
+        return obj
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Todos os campos; sem `total`, o dict serve de kwargs para recriar o objeto com outro total."""
+        out: Dict[str, Any] = {"total": float(self)}
+        out.update({name: getattr(self, name) for name in self.PHASES})
+        out.update(
+            bytes_out=self.bytes_out,
+            bytes_in=self.bytes_in,
+            status=self.status,
+            reused_connection=self.reused_connection,
+            from_cache=self.from_cache,
+            in_process=self.in_process,
+        )
+        return out
+
+
+# (json, tempos, erro) – formato devolvido por todos os helpers de API
+ApiResult = Tuple[Optional[Dict[str, Any]], RequestTiming, Optional[str]]
+
+
+class ConnectionState(threading.local):
+    """Estado por thread da última requisição: conexão reutilizada e fases de abertura.
+
+    O `requests` é síncrono, então a última conexão obtida do pool (e as fases medidas
+    abaixo) nesta thread são da requisição corrente. Cada sessão tem o seu objeto
+    (`TrackedSession.conn_state`), repassado a pools e conexões: como a sessão em
+    `cache_resource` sobrevive aos reruns do Streamlit, o estado vai junto com ela em vez
+    de depender de variáveis do módulo, que são recriadas a cada rerun.
+    """
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        self.reused = False
+        self.dns = self.connect = self.tls = 0.0
+
+
+class _TimedConnectionMixin:
+    """Mede DNS, TCP connect e handshake TLS de cada conexão nova aberta pelo pool.
+
+    A resolução é feita aqui (cronometrada) e o `urllib3` conecta no IP já resolvido,
+    tentando os endereços em ordem como o `create_connection` faria.
+    """
+
+    _measures_tls = False
+    _conn_state: ConnectionState  # definido pelo pool (`_TrackedPoolMixin._new_conn`)
+
+    def _new_conn(self):  # type: ignore[no-untyped-def]
+        state = self._conn_state
+        host = self._dns_host  # type: ignore[attr-defined]
+        t0 = time.perf_counter()
+        try:
+            infos = socket.getaddrinfo(host, self.port, 0, socket.SOCK_STREAM)  # type: ignore[attr-defined]
+            addrs = list(dict.fromkeys(info[4][0] for info in infos))
+        except OSError:
+            addrs = [host]  # o urllib3 repete a resolução e levanta o erro no formato dele
+        t1 = time.perf_counter()
+        state.dns += t1 - t0
+        try:
+            for i, addr in enumerate(addrs):
+                self._dns_host = addr  # type: ignore[attr-defined]
+                try:
+                    return super()._new_conn()  # type: ignore[misc]
+                except NewConnectionError:
+                    if i == len(addrs) - 1:
+                        raise
+        finally:
+            self._dns_host = host  # type: ignore[attr-defined]
+            state.connect += time.perf_counter() - t1
+
+    def connect(self) -> None:
+        if not self._measures_tls:
+            return super().connect()  # type: ignore[misc]
+        state = self._conn_state
+        before = state.dns + state.connect
+        t0 = time.perf_counter()
+        try:
+            super().connect()  # type: ignore[misc]
+        finally:
+            # O que sobra do `connect()` depois de DNS + TCP é o handshake TLS
+            setup = state.dns + state.connect - before
+            state.tls += time.perf_counter() - t0 - setup
+
+
+class _TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    _measures_tls = True
+
+
+class _TrackedPoolMixin:
+    """Marca se a conexão entregue pelo pool já tinha socket aberto (keep-alive)."""
+
+    def __init__(self, *args: Any, conn_state: ConnectionState, **kwargs: Any) -> None:
+        self._conn_state = conn_state
+        super().__init__(*args, **kwargs)  # type: ignore[call-arg]
+
+    def _new_conn(self):  # type: ignore[no-untyped-def]
+        conn = super()._new_conn()  # type: ignore[misc]
+        conn._conn_state = self._conn_state
+        return conn
+
+    def _get_conn(self, timeout=None):  # type: ignore[no-untyped-def]
+        conn = super()._get_conn(timeout=timeout)  # type: ignore[misc]
+        self._conn_state.reused = getattr(conn, "sock", None) is not None
+        return conn
+
+
+class _TrackedHTTPConnectionPool(_TrackedPoolMixin, HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TrackedHTTPSConnectionPool(_TrackedPoolMixin, HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _PooledAdapter(HTTPAdapter):
+    def __init__(self, conn_state: ConnectionState, **kwargs: Any) -> None:
+        self.conn_state = conn_state  # antes do `super().__init__`, que já cria o pool manager
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args: Any, **kwargs: Any) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": functools.partial(_TrackedHTTPConnectionPool, conn_state=self.conn_state),
+            "https": functools.partial(_TrackedHTTPSConnectionPool, conn_state=self.conn_state),
+        }
+
+
+class TrackedSession(requests.Session):
+    """`requests.Session` com o estado de conexão (reuso e fases) da sua própria pilha de pools."""
+
+    def __init__(self, conn_state: ConnectionState) -> None:
+        super().__init__()
+        self.conn_state = conn_state
+
+
+RETRY_STATUS = (502, 503, 504)  # respostas reenviadas pelos clientes síncrono e assíncrono
+
+
+def make_http_session(
+    pool_connections: int = API_POOL_CONNECTIONS,
+    pool_maxsize: int = API_POOL_MAXSIZE,
+    max_retries: int = API_MAX_RETRIES,
+    backoff_factor: float = API_BACKOFF_FACTOR,
+) -> TrackedSession:
+    """Sessão HTTP com pool keep-alive e retry/backoff.
+
+    - `pool_connections`: quantos hosts distintos mantêm pool em cache;
+    - `pool_maxsize`: limite de conexões simultâneas por host;
+    - retries cobrem falhas de conexão e 502/503/504. O POST /predict é incluído
+      porque a previsão é determinística (reenviar não tem efeito colateral).
+    """
+    retry = Retry(
+        total=max_retries,
+        connect=max_retries,
+        read=max_retries,
+        status=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUS,
+        allowed_methods=frozenset({"GET", "POST"}),
+        raise_on_status=False,
+    )
+    conn_state = ConnectionState()
+    adapter = _PooledAdapter(
+        conn_state, pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry
+    )
+    session = TrackedSession(conn_state)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+@st.cache_resource(show_spinner=False)
+def get_http_session(
+    pool_connections: int = API_POOL_CONNECTIONS,
+    pool_maxsize: int = API_POOL_MAXSIZE,
+    max_retries: int = API_MAX_RETRIES,
+    backoff_factor: float = API_BACKOFF_FACTOR,
+) -> TrackedSession:
+    """Sessão HTTP única por processo (ver `make_http_session`)."""
+    return make_http_session(pool_connections, pool_maxsize, max_retries, backoff_factor)
+
+
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+def encode_payload(payload: Any) -> bytes:
+    """Serializa o payload uma única vez (orjson); os bytes seguem direto para o `_request`."""
+    return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
 def _request(
     method: str,
     url: str,
     *,
-    json_payload: Optional[Dict[str, Any]] = None,
+    body: Optional[bytes] = None,
     timeout: int = 15,
-) -> Tuple[Optional[Dict[str, Any]], float, Optional[str]]:
-    """Envolve `requests` e retorna (json, latência_em_segundos, erro_str).
+    session: Optional[TrackedSession] = None,
+) -> ApiResult:
+    """Envolve a sessão `requests` compartilhada e retorna (json, tempos, erro_str).
 
-    Mantemos a assinatura simples para instrumentação/erros na UI.
+    Mantemos a assinatura simples para instrumentação/erros na UI. Os tempos vêm em um
+    `RequestTiming` (float com o total): `stream=True` separa o tempo até o cabeçalho
+    (ttfb) da leitura do corpo, e o decode do JSON é medido à parte.
+    `body` já vem serializado (ver `encode_payload`), evitando um segundo `json.dumps`.
+    `session` permite um pool dimensionado à parte (ex.: o gerador de carga).
     """
-    start = datetime.now()
+    session = session or get_http_session()
+    state = session.conn_state
+    state.reset()
+    bytes_out = len(body) if body is not None else 0
+    start = time.perf_counter()
+    t_headers: Optional[float] = None
+    t_body: Optional[float] = None
+    content = b""
+    resp = None
+
+    def timing(end: float) -> RequestTiming:
+        setup = state.dns + state.connect + state.tls
+        head_end = t_headers if t_headers is not None else end
+        body_end = t_body if t_body is not None else head_end
+        return RequestTiming(
+            end - start,
+            state.reused,
+            bytes_out=bytes_out,
+            bytes_in=len(content),
+            status=resp.status_code if resp is not None else 0,
+            dns=state.dns,
+            connect=state.connect,
+            tls=state.tls,
+            ttfb=head_end - start - setup,
+            download=body_end - head_end,
+            decode=end - body_end,
+        )
+
     try:
-        resp = requests.request(method, url, json=json_payload, timeout=timeout)
-        latency = (datetime.now() - start).total_seconds()
+        headers = _JSON_HEADERS if body is not None else None
+        resp = session.request(method, url, data=body, headers=headers, timeout=timeout, stream=True)
+        t_headers = time.perf_counter()
+        content = resp.content
+        t_body = time.perf_counter()
         resp.raise_for_status()
         # Tenta JSON; se falhar, devolve texto bruto
         try:
-            return resp.json(), latency, None
+            data = orjson.loads(content)
         except Exception:
-            return {"raw": resp.text}, latency, None
+            data = {"raw": resp.text}
+        result: ApiResult = (data, timing(time.perf_counter()), None)
     except Exception as exc:  # noqa: BLE001 – exibimos erro detalhado na UI
-        latency = (datetime.now() - start).total_seconds()
-        return None, latency, str(exc)
+        result = (None, timing(time.perf_counter()), str(exc))
+    finally:
+        if resp is not None:
+            resp.close()  # devolve a conexão ao pool mesmo se o corpo não foi lido
+    _record_latency(url, result)
+    return result
+
+
+def _fmt_ms(seconds: float) -> str:
+    return f"{seconds * 1e3:.1f}ms" if seconds >= 1e-3 else f"{seconds * 1e6:.0f}µs"
+
+
+def _fmt_bytes(n: int) -> str:
+    if n < 1024:
+        return f"{n}B"
+    if n < 1024**2:
+        return f"{n / 1024:.1f}kB"
+    return f"{n / 1024**2:.1f}MB"
+
+
+def fmt_latency(lat: float) -> str:
+    """Formata os tempos para a UI: total, fases (DNS/conexão/TLS/TTFB/download/decode) e bytes."""
+    if getattr(lat, "from_cache", False):
+        return f"{_fmt_ms(lat)}, cache"
+    if getattr(lat, "in_process", False):
+        return f"{_fmt_ms(lat)}, em processo"
+    if not isinstance(lat, RequestTiming):
+        return f"{lat:.3f}s"
+    if lat.reused_connection:
+        phases = ["conexão reutilizada"]
+    else:
+        phases = [f"dns {_fmt_ms(lat.dns)}", f"conexão {_fmt_ms(lat.connect)}"]
+        if lat.tls:
+            phases.append(f"tls {_fmt_ms(lat.tls)}")
+    phases += [f"ttfb {_fmt_ms(lat.ttfb)}", f"download {_fmt_ms(lat.download)}", f"decode {_fmt_ms(lat.decode)}"]
+    return (
+        f"{lat:.3f}s: {' · '.join(phases)}; "
+        f"↑{_fmt_bytes(lat.bytes_out)} ↓{_fmt_bytes(lat.bytes_in)}"
+    )
+
+
+def api_health(api_url: str) -> ApiResult:
+    return _request("GET", f"{api_url.rstrip('/')}/health")
+
+
+def api_metadata(api_url: str) -> ApiResult:
+    url = f"{api_url.rstrip('/')}/metadata"
+    return single_flight().do(("GET", url), lambda: _request("GET", url))
+
+
+def api_predict(api_url: str, payload: Dict[str, Any], body: Optional[bytes] = None) -> ApiResult:
+    """POST /predict; passe `body` quando o payload já tiver sido serializado.
+
+    Sessões que mandam o mesmo payload ao mesmo tempo compartilham uma única chamada.
+    """
+    url = f"{api_url.rstrip('/')}/predict"
+    body = body if body is not None else encode_payload(payload)
+    key = ("POST", url, hashlib.blake2b(body, digest_size=16).digest())
+    return single_flight().do(key, lambda: _request("POST", url, body=body))
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def cached_api_metadata(api_url: str) -> Optional[Dict[str, Any]]:
+    """`/metadata` com cache curto, para negociar formato/endpoints sem chamar a API a cada rerun."""
+    data, _, err = api_metadata(api_url)
+    return None if err else data
+
+
+# ============================
+# Cliente assíncrono (httpx) para chamadas concorrentes
+# ============================
+class _StatusRetryTransport(httpx.AsyncBaseTransport):
+    """Reenvia respostas `RETRY_STATUS` com o backoff do `Retry` do urllib3 (cliente síncrono).
+
+    O `retries` do `httpx.AsyncHTTPTransport` só repete falhas de conexão. Como no urllib3,
+    o primeiro reenvio é imediato, os seguintes esperam `backoff_factor * 2**(n - 1)` s
+    (até `BACKOFF_MAX`) e um 503 com `Retry-After` em segundos espera o que o servidor pediu.
+    """
+
+    BACKOFF_MAX = 120.0
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, max_retries: int, backoff_factor: float) -> None:
+        self._transport = transport
+        self._max_retries = max_retries
+        self._backoff_factor = backoff_factor
+
+    def _delay(self, retry: int, response: httpx.Response) -> float:
+        after = response.headers.get("Retry-After", "")
+        if response.status_code == 503 and after.isdigit():
+            return float(after)
+        return 0.0 if retry <= 1 else min(self._backoff_factor * 2 ** (retry - 1), self.BACKOFF_MAX)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        for retry in range(1, self._max_retries + 1):
+            response = await self._transport.handle_async_request(request)
+            if response.status_code not in RETRY_STATUS:
+                return response
+            await response.aclose()
+            await asyncio.sleep(self._delay(retry, response))
+        return await self._transport.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+def make_async_client(
+    max_connections: int = API_POOL_MAXSIZE,
+    max_retries: int = API_MAX_RETRIES,
+    backoff_factor: float = API_BACKOFF_FACTOR,
+) -> httpx.AsyncClient:
+    """Cria um `httpx.AsyncClient` com os mesmos limites de pool/retry do cliente síncrono.
+
+    Falhas de conexão são repetidas pelo transporte do httpx; 502/503/504, com backoff,
+    por `_StatusRetryTransport`. Um cliente assíncrono fica preso ao event loop em que foi
+    criado; como cada `asyncio.run` da UI abre um loop novo, o cliente vive apenas durante
+    o lote de chamadas.
+    """
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+    transport = httpx.AsyncHTTPTransport(limits=limits, retries=max_retries)
+    return httpx.AsyncClient(transport=_StatusRetryTransport(transport, max_retries, backoff_factor))
+
+
+async def _arequest(
+    client: httpx.AsyncClient,
+    method: str,
+    url: str,
+    *,
+    body: Optional[bytes] = None,
+    timeout: int = 15,
+) -> ApiResult:
+    """Versão assíncrona de `_request`, com o mesmo contrato (json, tempos, erro).
+
+    As fases vêm dos eventos de `trace` do httpcore; nele a resolução DNS acontece dentro
+    do connect TCP, então `dns` fica zerado e o tempo entra em `connect`.
+    """
+    marks: Dict[str, float] = {}
+
+    async def trace(event_name: str, info: Dict[str, Any]) -> None:
+        # Com reenvios, fica a última tentativa: `ttfb` inclui os retries, como no síncrono
+        marks[event_name] = time.perf_counter()
+
+    def span(prefix: str) -> float:
+        begin, end = marks.get(f"{prefix}.started"), marks.get(f"{prefix}.complete")
+        return end - begin if begin is not None and end is not None else 0.0
+
+    bytes_out = len(body) if body is not None else 0
+    start = time.perf_counter()
+    content = b""
+    t_body: Optional[float] = None
+    resp: Optional[httpx.Response] = None
+
+    def timing(end: float) -> RequestTiming:
+        connect, tls = span("connection.connect_tcp"), span("connection.start_tls")
+        head_end = next(
+            (t for name, t in marks.items() if name.endswith("receive_response_headers.complete")), t_body or end
+        )
+        body_end = t_body if t_body is not None else head_end
+        return RequestTiming(
+            end - start,
+            "connection.connect_tcp.started" not in marks,
+            bytes_out=bytes_out,
+            bytes_in=len(content),
+            status=resp.status_code if resp is not None else 0,
+            connect=connect,
+            tls=tls,
+            ttfb=head_end - start - connect - tls,
+            download=body_end - head_end,
+            decode=end - body_end,
+        )
+
+    try:
+        headers = _JSON_HEADERS if body is not None else None
+        resp = await client.request(
+            method, url, content=body, headers=headers, timeout=timeout, extensions={"trace": trace}
+        )
+        content = resp.content
+        t_body = time.perf_counter()
+        resp.raise_for_status()
+        try:
+            data = orjson.loads(content)
+        except Exception:
+            data = {"raw": resp.text}
+        result: ApiResult = (data, timing(time.perf_counter()), None)
+    except Exception as exc:  # noqa: BLE001 – exibimos erro detalhado na UI
+        result = (None, timing(time.perf_counter()), str(exc))
+    _record_latency(url, result)
+    return result
+
+
+async def async_api_health(api_url: str, *, client: httpx.AsyncClient) -> ApiResult:
+    return await _arequest(client, "GET", f"{api_url.rstrip('/')}/health")
+
+
+async def async_api_metadata(api_url: str, *, client: httpx.AsyncClient) -> ApiResult:
+    return await _arequest(client, "GET", f"{api_url.rstrip('/')}/metadata")
+
+
+async def async_api_predict(api_url: str, payload: Dict[str, Any], *, client: httpx.AsyncClient) -> ApiResult:
+    """`/predict` assíncrono, com o mesmo reenvio em registros de `api_predict_with_fallback`."""
+    url = f"{api_url.rstrip('/')}/predict"
+    result = await _arequest(client, "POST", url, body=encode_payload(payload))
+    if format_rejected(payload, result):
+        return await _arequest(client, "POST", url, body=encode_payload(payload_to_records(payload)))
+    return result
+
+
+async def gather_api_calls(
+    *calls: Callable[[httpx.AsyncClient], Awaitable[ApiResult]],
+    max_connections: int = API_POOL_MAXSIZE,
+) -> List[ApiResult]:
+    """Executa as chamadas concorrentemente sobre um único `AsyncClient`.
+
+    Cada item recebe o cliente e devolve a corrotina, ex.:
+        `lambda c: async_api_health(url, client=c)`.
+    Os resultados voltam na mesma ordem das chamadas.
+    """
+    async with make_async_client(max_connections) as client:
+        return list(await asyncio.gather(*(call(client) for call in calls)))
+
+
+def run_api_calls(
+    *calls: Callable[[httpx.AsyncClient], Awaitable[ApiResult]],
+    max_connections: int = API_POOL_MAXSIZE,
+) -> List[ApiResult]:
+    """Ponte síncrona para a UI: roda `gather_api_calls` em um event loop próprio."""
+    return asyncio.run(gather_api_calls(*calls, max_connections=max_connections))
+
+
+# ============================
+# Previsão em lote (watchlist)
+# ============================
+def parse_tickers(text: str) -> List[str]:
+    """Lê tickers separados por vírgula, espaço ou quebra de linha (sem duplicatas, ordem preservada)."""
+    seen: Dict[str, None] = {}
+    for tok in text.replace(",", " ").replace(";", " ").split():
+        seen.setdefault(tok.strip().upper(), None)
+    return [t for t in seen if t]
+
+
+def detect_batch_endpoint(metadata: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Retorna o caminho do endpoint de lote se o `/metadata` anunciar um.
+
+    Aceitamos `{"batch_endpoint": "/predict/batch"}` ou `"/predict/batch"` na lista `endpoints`.
+    """
+    if not isinstance(metadata, dict):
+        return None
+    path = metadata.get("batch_endpoint")
+    if isinstance(path, str) and path:
+        return path
+    endpoints = metadata.get("endpoints")
+    if isinstance(endpoints, list) and "/predict/batch" in endpoints:
+        return "/predict/batch"
+    return None
+
+
+def api_predict_batch(api_url: str, endpoint: str, payloads: List[Dict[str, Any]]) -> ApiResult:
+    """POST único com o array de payloads no corpo (endpoint de lote do backend).
+
+    Se o backend recusar o histórico colunar, reenvia o lote inteiro em registros.
+    """
+    url = f"{api_url.rstrip('/')}/{endpoint.lstrip('/')}"
+    result = _request("POST", url, body=encode_payload(payloads), timeout=120)
+    if any(format_rejected(p, result) for p in payloads):
+        return _request("POST", url, body=encode_payload([payload_to_records(p) for p in payloads]), timeout=120)
+    return result
+
+
+async def async_api_predict_many(
+    api_url: str,
+    payloads: List[Dict[str, Any]],
+    *,
+    concurrency: int,
+    client: httpx.AsyncClient,
+) -> List[ApiResult]:
+    """Dispara um `/predict` por payload com no máximo `concurrency` chamadas em voo."""
+    sem = asyncio.Semaphore(max(1, concurrency))
+
+    async def one(payload: Dict[str, Any]) -> ApiResult:
+        async with sem:
+            return await async_api_predict(api_url, payload, client=client)
+
+    return list(await asyncio.gather(*(one(p) for p in payloads)))
+
+
+def _batch_row(ticker: str, result: ApiResult) -> Dict[str, Any]:
+    data, lat, err = result
+    row: Dict[str, Any] = {"ticker": ticker, "latency_s": round(float(lat), 4), "error": err}
+    preds = data.get("predictions") if isinstance(data, dict) else None
+    if err is None and not isinstance(preds, list):
+        row["error"] = "Resposta sem `predictions`"
+    if isinstance(preds, list):
+        for i, value in enumerate(preds, start=1):
+            row[f"pred_{i}"] = value
+    if isinstance(data, dict) and data.get("last_date"):
+        row["last_date"] = data["last_date"]
+    return row
+
+
+def predict_watchlist(
+    api_url: str,
+    payloads: Dict[str, Dict[str, Any]],
+    *,
+    concurrency: int = 8,
+    batch_endpoint: Optional[str] = None,
+) -> pd.DataFrame:
+    """Executa a previsão de todos os tickers e devolve uma tabela única.
+
+    Com `batch_endpoint`, envia um único POST com o array de payloads (a latência por
+    ticker passa a ser a da chamada inteira). Se o lote falhar ou vier em formato
+    inesperado, cai para o fan-out de `/predict` com concorrência limitada.
+    Colunas: ticker, latency_s, error, pred_1..pred_H (e last_date, se houver).
+    """
+    tickers = list(payloads)
+    results: Optional[List[ApiResult]] = None
+    if batch_endpoint:
+        data, lat, err = api_predict_batch(api_url, batch_endpoint, list(payloads.values()))
+        items = data.get("results") if isinstance(data, dict) else data
+        if err is None and isinstance(items, list) and len(items) == len(tickers):
+            results = [
+                (item, lat, item.get("error") if isinstance(item, dict) else None)
+                for item in items
+            ]
+    if results is None:
+
+        async def fan_out() -> List[ApiResult]:
+            async with make_async_client(concurrency) as client:
+                return await async_api_predict_many(api_url, list(payloads.values()), concurrency=concurrency, client=client)
+
+        results = asyncio.run(fan_out())
+    rows = [_batch_row(t, r) for t, r in zip(tickers, results)]
+    return pd.DataFrame(rows)
+
+
+# ============================
+# Dados auxiliares via yfinance (opcional)
+# ============================
+OHLCV_COLUMNS = ("Open", "High", "Low", "Close", "Volume")
+
+
+class NYSECalendar(AbstractHolidayCalendar):
+    """Feriados da NYSE (aproximação suficiente para decidir se há pregão novo)."""
+
+    rules = [
+        Holiday("NewYearsDay", month=1, day=1, observance=sunday_to_monday),
+        USMartinLutherKingJr,
+        USPresidentsDay,
+        GoodFriday,
+        USMemorialDay,
+        Holiday("Juneteenth", month=6, day=19, start_date="2022-01-01", observance=nearest_workday),
+        Holiday("IndependenceDay", month=7, day=4, observance=nearest_workday),
+        USLaborDay,
+        USThanksgivingDay,
+        Holiday("Christmas", month=12, day=25, observance=nearest_workday),
+    ]
+
+
+NYSE_SESSION = CustomBusinessDay(calendar=NYSECalendar())
+# Fechamento 16:00 (NY) + folga para o Yahoo consolidar o candle diário
+NYSE_DATA_READY = pd.Timedelta(hours=16, minutes=30)
+
+
+def last_session_close(now: Optional[pd.Timestamp] = None) -> pd.Timestamp:
+    """Instante (UTC) em que o último pregão encerrado ficou disponível no Yahoo."""
+    now_ny = (now or pd.Timestamp.now(tz="UTC")).tz_convert("America/New_York")
+    day = now_ny.normalize()
+    if not NYSE_SESSION.is_on_offset(day) or now_ny < day + NYSE_DATA_READY:
+        day = day - NYSE_SESSION
+    return (day + NYSE_DATA_READY).tz_convert("UTC")
+
+
+@contextmanager
+def _file_lock(path: Path, exclusive: bool = True) -> Iterator[None]:
+    """Lock consultivo (`flock`) em `<path>.lock`, válido entre threads e processos."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(f"{path}.lock", "a+") as fh:
+        if fcntl is not None:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+
+def _safe_ticker(ticker: str) -> str:
+    return "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in ticker.upper())
+
+
+def history_cache_path(ticker: str, interval: str = "1d", auto_adjust: bool = False, provider: str = "yahoo") -> Path:
+    """Arquivo Parquet do cache: `<RAW_DIR>/ohlcv/[<provider>/]<TICKER>_<interval>_<adj|raw>.parquet`.
+
+    O Yahoo fica na raiz (layout original); outras fontes ganham subpasta própria para
+    nunca misturar dados sintéticos com reais.
+    """
+    base = Path(RAW_DIR) / "ohlcv"
+    if provider != "yahoo":
+        base = base / provider
+    return base / f"{_safe_ticker(ticker)}_{interval}_{'adj' if auto_adjust else 'raw'}.parquet"
+
+
+def _read_cache_meta(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        return orjson.loads(path.with_suffix(".json").read_bytes())
+    except (OSError, orjson.JSONDecodeError):
+        return None
+
+
+def _atomic_write(path: Path, write: Callable[[Path], None]) -> None:
+    """Escreve em arquivo temporário no mesmo diretório e troca com `os.replace`."""
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def _write_history_cache(path: Path, df: pd.DataFrame, start: str, fetched_at: Optional[float] = None) -> None:
+    """Grava série + meta. `fetched_at` (padrão: agora) é o instante da última consulta bem-sucedida
+    da cauda na fonte; é ele que decide a validade em `is_cache_fresh`.
+    """
+    meta = {"start": start, "fetched_at": time.time() if fetched_at is None else fetched_at, "rows": len(df)}
+    _atomic_write(path, lambda tmp: df.to_parquet(tmp))
+    _atomic_write(path.with_suffix(".json"), lambda tmp: tmp.write_bytes(orjson.dumps(meta)))
+
+
+def is_cache_fresh(meta: Dict[str, Any], interval: str = "1d", now: Optional[pd.Timestamp] = None) -> bool:
+    """Entrada fresca se foi gravada há menos de `YF_CACHE_TTL_SECONDS` ou, no diário,
+    se foi baixada depois do fechamento do último pregão (nenhum candle novo desde então).
+    """
+    fetched_at = float(meta.get("fetched_at", 0.0))
+    now = now or pd.Timestamp.now(tz="UTC")
+    if now.timestamp() - fetched_at < YF_CACHE_TTL_SECONDS:
+        return True
+    if interval != "1d":
+        return False
+    return fetched_at >= last_session_close(now).timestamp()
+
+
+def _normalize_ohlcv(df: Any) -> pd.DataFrame:
+    """Recorta as colunas OHLCV, remove NaN e garante índice de datas ordenado."""
+    if not isinstance(df, pd.DataFrame) or df.empty or not set(OHLCV_COLUMNS) <= set(df.columns):
+        return pd.DataFrame()
+    df = df[list(OHLCV_COLUMNS)].dropna().copy()
+    df.index = pd.to_datetime(df.index)
+    df.sort_index(inplace=True)
+    return df
+
+
+def _download_yf(ticker: str, start: str, end: str, interval: str = "1d", auto_adjust: bool = False) -> pd.DataFrame:
+    """Chamada crua ao yfinance, normalizada para as colunas OHLCV com índice de datas."""
+    df = yf.download(ticker, start=start, end=end, interval=interval, auto_adjust=auto_adjust, progress=False)
+    if isinstance(df, pd.DataFrame) and isinstance(df.columns, pd.MultiIndex):  # yfinance novo: (Price, Ticker)
+        df.columns = df.columns.get_level_values(0)
+    return _normalize_ohlcv(df)
+
+
+YF_BULK_CHUNK = int(os.getenv("YF_BULK_CHUNK", "100"))  # símbolos por chamada do yf.download
+
+
+def _download_yf_bulk(
+    tickers: List[str], start: str, end: str, interval: str = "1d", auto_adjust: bool = False
+) -> Dict[str, pd.DataFrame]:
+    """Um único `yf.download` (threaded) para vários símbolos, separado em um frame por ticker."""
+    raw = yf.download(
+        tickers,
+        start=start,
+        end=end,
+        interval=interval,
+        auto_adjust=auto_adjust,
+        group_by="ticker",
+        threads=True,
+        progress=False,
+    )
+    out: Dict[str, pd.DataFrame] = {}
+    if not isinstance(raw, pd.DataFrame) or raw.empty:
+        return out
+    if not isinstance(raw.columns, pd.MultiIndex):  # versões antigas com um único ticker
+        out[tickers[0]] = _normalize_ohlcv(raw)
+        return out
+    available = set(raw.columns.get_level_values(0))
+    for t in tickers:
+        if t in available:
+            out[t] = _normalize_ohlcv(raw[t])
+    return out
+
+
+def _slice_from(df: pd.DataFrame, start: str) -> pd.DataFrame:
+    return df.loc[df.index >= pd.Timestamp(start)] if not df.empty else df
+
+
+def _merge_history(parts: List[pd.DataFrame]) -> pd.DataFrame:
+    """Concatena trechos de uma mesma série, mantendo o dado mais novo em datas repetidas."""
+    parts = [p for p in parts if not p.empty]
+    if not parts:
+        return pd.DataFrame()
+    merged = pd.concat(parts)
+    return merged[~merged.index.duplicated(keep="last")].sort_index()
+
+
+# ============================
+# Provedores de histórico (Yahoo, diretório local, sintético)
+# ============================
+class HistoryProvider(ABC):
+    """Interface de uma fonte de OHLCV. `download` segue a semântica do `yf.download`:
+    intervalo [start, end) e retorno já normalizado (`OHLCV_COLUMNS`, índice de datas).
+
+    `cacheable` indica se os dados passam pelo cache em disco (`RAW_DIR/ohlcv`).
+    """
+
+    name = "base"
+    cacheable = True
+
+    @abstractmethod
+    def download(self, ticker: str, start: str, end: str, interval: str = "1d", auto_adjust: bool = False) -> pd.DataFrame:
+        ...
+
+    def download_many(
+        self, tickers: List[str], start: str, end: str, interval: str = "1d", auto_adjust: bool = False
+    ) -> Dict[str, pd.DataFrame]:
+        return {t: self.download(t, start, end, interval, auto_adjust) for t in tickers}
+
+
+class YahooProvider(HistoryProvider):
+    name = "yahoo"
+
+    # Downloads idênticos simultâneos (várias sessões no mesmo ticker) viram uma só chamada
+    def download(self, ticker: str, start: str, end: str, interval: str = "1d", auto_adjust: bool = False) -> pd.DataFrame:
+        key = ("yf", ticker.upper(), start, end, interval, auto_adjust)
+        return single_flight().do(key, lambda: _download_yf(ticker, start, end, interval, auto_adjust))
+
+    def download_many(
+        self, tickers: List[str], start: str, end: str, interval: str = "1d", auto_adjust: bool = False
+    ) -> Dict[str, pd.DataFrame]:
+        key = ("yf-bulk", tuple(sorted(t.upper() for t in tickers)), start, end, interval, auto_adjust)
+        return single_flight().do(key, lambda: _download_yf_bulk(tickers, start, end, interval, auto_adjust))
+
+
+def read_ohlcv_file(path: Path) -> pd.DataFrame:
+    """Lê Parquet/Feather/Arrow/CSV com colunas OHLCV (nomes sem distinção de caixa) e Date."""
+    try:
+        with open(path, "rb") as fh:
+            df = read_ohlcv_tail(fh, path.name)
+    except MissingColumnsError:
+        return pd.DataFrame()
+    if not isinstance(df.index, pd.DatetimeIndex):
+        return pd.DataFrame()
+    return _normalize_ohlcv(df)
+
+
+class LocalDirProvider(HistoryProvider):
+    """Lê `<root>/<TICKER>.parquet|.feather|.arrow|.csv` (ex.: exportações em `data/raw`)."""
+
+    name = "local"
+    cacheable = False  # os arquivos já estão em disco; copiar para o cache não ajuda
+    suffixes = (".parquet", ".feather", ".arrow", ".csv")
+
+    def __init__(self, root: str = HISTORY_LOCAL_DIR) -> None:
+        self.root = Path(root)
+
+    def download(self, ticker: str, start: str, end: str, interval: str = "1d", auto_adjust: bool = False) -> pd.DataFrame:
+        for suffix in self.suffixes:
+            for name in (ticker, ticker.upper(), _safe_ticker(ticker)):
+                path = self.root / f"{name}{suffix}"
+                if path.exists():
+                    df = read_ohlcv_file(path)
+                    if df.empty:
+                        return df
+                    return df.loc[(df.index >= pd.Timestamp(start)) & (df.index < pd.Timestamp(end))]
+        return pd.DataFrame()
+
+
+_INTERVAL_FREQ = {"1m": "1min", "2m": "2min", "5m": "5min", "15m": "15min", "30m": "30min", "60m": "1h", "1h": "1h"}
+
+
+def _hash_uniform(x: np.ndarray, key: int) -> np.ndarray:
+    """Uniformes em [0, 1) determinísticos por (x, key) – splitmix64 vetorizado."""
+    z = x.astype(np.uint64) ^ np.uint64(key)
+    with np.errstate(over="ignore"):
+        z = z + np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    z = z ^ (z >> np.uint64(31))
+    return (z >> np.uint64(11)).astype(np.float64) * (1.0 / (1 << 53))
+
+
+class SyntheticProvider(HistoryProvider):
+    """Gerador determinístico e sem rede, para benchmarks e testes de carga.
+
+    Cada candle é função apenas de (ticker, seed, timestamp): intervalos sobrepostos
+    devolvem exatamente os mesmos valores, então cache e deltas se comportam como no
+    Yahoo. O tamanho dos dados é controlado só pelo período/intervalo pedidos.
+    """
+
+    name = "synthetic"
+
+    def __init__(self, seed: int = SYNTHETIC_SEED) -> None:
+        self.seed = seed
+
+    def download(self, ticker: str, start: str, end: str, interval: str = "1d", auto_adjust: bool = False) -> pd.DataFrame:
+        if interval == "1d":
+            idx = pd.date_range(start, end, freq=NYSE_SESSION, inclusive="left")
+        else:
+            idx = pd.date_range(start, end, freq=_INTERVAL_FREQ.get(interval, interval), inclusive="left")
+            idx = idx[idx.dayofweek < 5]
+        if len(idx) == 0:
+            return pd.DataFrame()
+        idx = idx.rename("Date")
+        key = zlib.crc32(ticker.upper().encode()) ^ (self.seed << 32)
+        secs = (idx.asi8 // 10**9).astype(np.int64)
+        year = 365.25 * 86400.0
+        phase = (key % 997) / 997 * 2 * np.pi
+        base = 20.0 + (key % 480)
+        log_close = (
+            np.log(base)
+            + 0.25 * np.sin(2 * np.pi * secs / year + phase)
+            + 0.08 * np.sin(2 * np.pi * secs / (year / 4) + 2 * phase)
+            + 0.02 * (_hash_uniform(secs, key) - 0.5)
+        )
+        close = np.exp(log_close)
+        open_ = close * (1 + 0.01 * (_hash_uniform(secs, key + 1) - 0.5))
+        high = np.maximum(open_, close) * (1 + 0.01 * _hash_uniform(secs, key + 2))
+        low = np.minimum(open_, close) * (1 - 0.01 * _hash_uniform(secs, key + 3))
+        volume = np.floor(1e6 * (1 + 9 * _hash_uniform(secs, key + 4)))
+        return pd.DataFrame({"Open": open_, "High": high, "Low": low, "Close": close, "Volume": volume}, index=idx)
+
+
+HISTORY_PROVIDERS: Dict[str, Callable[[], HistoryProvider]] = {
+    "yahoo": YahooProvider,
+    "local": LocalDirProvider,
+    "synthetic": SyntheticProvider,
+}
+
+
+def get_history_provider(name: str = HISTORY_PROVIDER) -> HistoryProvider:
+    """Instancia a fonte pelo nome (`HISTORY_PROVIDER` no ambiente ou seleção na sidebar)."""
+    try:
+        return HISTORY_PROVIDERS[name]()
+    except KeyError:
+        raise ValueError(f"Fonte de histórico desconhecida: {name!r} (use {', '.join(HISTORY_PROVIDERS)})") from None
+
+
+# ============================
+# Histórico com cache em memória (faixa) e em disco
+# ============================
+class HistoryRangeCache:
+    """Cache por processo da faixa mais larga já carregada de cada série.
+
+    Pedidos com `days_back` menor são atendidos fatiando em memória; só um início
+    anterior ao guardado (ou a entrada vencer, ver `is_cache_fresh`) volta ao `load_history`.
+    A validade usa o `fetched_at` da origem (meta do cache em disco), não o instante em que
+    a série entrou aqui: dado já vencido no disco continua vencido em memória.
+    """
+
+    def __init__(self) -> None:
+        self._entries: Dict[Tuple[str, str, str, bool], Dict[str, Any]] = {}
+        self._locks: Dict[Tuple[str, str, str, bool], threading.Lock] = {}
+        self._guard = threading.Lock()
+
+    def lock(self, key: Tuple[str, str, str, bool]) -> threading.Lock:
+        with self._guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def get(self, key: Tuple[str, str, str, bool], start: str, interval: str) -> Optional[pd.DataFrame]:
+        entry = self._entries.get(key)
+        if entry is None or entry["start"] > start or not is_cache_fresh(entry, interval):
+            return None
+        return entry["df"]
+
+    def put(self, key: Tuple[str, str, str, bool], start: str, df: pd.DataFrame, fetched_at: float) -> None:
+        if df.empty:  # falha de carga: não guarda, a próxima chamada tenta de novo
+            return
+        self._entries[key] = {"start": start, "df": df, "fetched_at": fetched_at}
+
+
+@st.cache_resource(show_spinner=False)
+def history_range_cache() -> HistoryRangeCache:
+    return HistoryRangeCache()
+
+
+# Faixa mínima carregada por série: cobre o maior `days_back` da UI (3 × window máx. = 540),
+# então mexer no slider de janela nunca dispara um novo download.
+HISTORY_MIN_DAYS = int(os.getenv("HISTORY_MIN_DAYS", "730"))
+
+
+def fetch_history_yf(
+    ticker: str,
+    days_back: int = 400,
+    interval: str = "1d",
+    auto_adjust: bool = False,
+    provider: str = HISTORY_PROVIDER,
+) -> pd.DataFrame:
+    """Busca OHLCV recente na fonte escolhida (`provider`, yfinance por padrão) para visualização e/ou envio ao backend.
+
+    days_back: janela de histórico para exibir/usar (aprox.).
+    Retorna DataFrame com colunas padrão do Yahoo (Open, High, Low, Close, Volume).
+
+    Carrega pelo menos `HISTORY_MIN_DAYS` de uma vez e guarda a faixa em memória
+    (`HistoryRangeCache`); pedidos menores são só fatias. Quando é preciso alargar, o
+    `load_history` baixa apenas o trecho que falta.
+    """
+    start = (datetime.now() - timedelta(days=days_back)).date().isoformat()
+    key = (provider, ticker.upper(), interval, auto_adjust)
+    cache = history_range_cache()
+    df = cache.get(key, start, interval)
+    if df is None:
+        with cache.lock(key):
+            df = cache.get(key, start, interval)  # outra sessão pode ter carregado enquanto esperávamos
+            if df is None:
+                wide_days = max(days_back, HISTORY_MIN_DAYS)
+                df, fetched_at = _load_history(ticker, wide_days, interval, auto_adjust, provider)
+                cache.put(key, (datetime.now() - timedelta(days=wide_days)).date().isoformat(), df, fetched_at)
+    return _slice_from(df, start)
+
+
+def load_history(
+    ticker: str,
+    days_back: int = 400,
+    interval: str = "1d",
+    auto_adjust: bool = False,
+    provider: str = HISTORY_PROVIDER,
+) -> pd.DataFrame:
+    """Carrega `days_back` dias da fonte passando pelo cache em disco.
+
+    Consulta o Parquet em `RAW_DIR`, que sobrevive a restarts e é compartilhado entre
+    sessões e réplicas no mesmo volume (ver `is_cache_fresh`). Com entrada existente,
+    baixa só o delta (`refresh_history_delta`) em vez do período inteiro. `provider`
+    troca a fonte (ver `get_history_provider`); o padrão continua sendo o Yahoo.
+    """
+    return _load_history(ticker, days_back, interval, auto_adjust, provider)[0]
+
+
+def _load_history(
+    ticker: str, days_back: int, interval: str, auto_adjust: bool, provider: str
+) -> Tuple[pd.DataFrame, float]:
+    """`load_history` + o `fetched_at` da série devolvida (agora, para fontes sem cache em disco)."""
+    source = get_history_provider(provider)
+    end = datetime.now()
+    start = (end - timedelta(days=days_back)).date().isoformat()
+    if not source.cacheable:
+        return source.download(ticker, start, end.date().isoformat(), interval, auto_adjust), time.time()
+    path = history_cache_path(ticker, interval, auto_adjust, source.name)
+    # Lock exclusivo: se outra sessão/processo já está baixando, esperamos e reutilizamos
+    with _file_lock(path):
+        meta = _read_cache_meta(path)
+        cached = pd.read_parquet(path) if meta is not None and path.exists() else None
+        if cached is None or cached.empty:
+            fetched_at = time.time()
+            df = source.download(ticker, start, end.date().isoformat(), interval, auto_adjust)
+            if not df.empty:
+                _write_history_cache(path, df, start, fetched_at)
+            return df, fetched_at
+        if meta["start"] > start or not is_cache_fresh(meta, interval):
+            cached = refresh_history_delta(
+                path, cached, meta, ticker, start, end.date().isoformat(), interval, auto_adjust, source
+            )
+            meta = _read_cache_meta(path) or meta
+    return _slice_from(cached, start), float(meta.get("fetched_at", 0.0))
+
+
+def refresh_history_delta(
+    path: Path,
+    cached: pd.DataFrame,
+    meta: Dict[str, Any],
+    ticker: str,
+    start: str,
+    end: str,
+    interval: str = "1d",
+    auto_adjust: bool = False,
+    source: Optional[HistoryProvider] = None,
+) -> pd.DataFrame:
+    """Completa a série salva com apenas o que falta e regrava o cache de forma atômica.
+
+    - cauda: baixa a partir do último candle salvo (inclusive, pois ele pode ter sido
+      gravado ainda parcial durante o pregão) até `end`;
+    - cabeça: se `start` for anterior ao início salvo, baixa só o trecho [start, início).
+    O merge remove datas duplicadas mantendo o dado mais novo. Deve ser chamado com o
+    lock do arquivo já adquirido.
+
+    `fetched_at` só avança quando a cauda volta com linhas: como ela começa no último
+    candle salvo, uma consulta que funcionou nunca vem vazia. Download falho (o yfinance
+    devolve frame vazio) ou só a cabeça alargada mantêm o valor antigo, e a entrada
+    continua vencida para a próxima tentativa.
+    """
+    source = source or YahooProvider()
+    parts = []
+    cached_start = str(meta["start"])
+    fetched_at = float(meta.get("fetched_at", 0.0))
+    if start < cached_start:
+        parts.append(source.download(ticker, start, cached_start, interval, auto_adjust))
+    parts.append(cached)
+    if not is_cache_fresh(meta, interval):
+        last = cached.index.max().date().isoformat()
+        requested_at = time.time()
+        tail = source.download(ticker, last, end, interval, auto_adjust)
+        if not tail.empty:
+            parts.append(tail)
+            fetched_at = requested_at
+    if len(parts) == 1:  # nada novo: não reescreve o arquivo
+        return cached
+    merged = _merge_history(parts)
+    _write_history_cache(path, merged, min(start, cached_start), fetched_at)
+    return merged
+
+
+def fetch_history_bulk(
+    tickers: List[str],
+    days_back: int = 400,
+    interval: str = "1d",
+    auto_adjust: bool = False,
+    chunk_size: int = YF_BULK_CHUNK,
+    provider: str = HISTORY_PROVIDER,
+) -> Dict[str, pd.DataFrame]:
+    """Versão multi-ticker de `fetch_history_yf`, com o mesmo contrato de colunas.
+
+    Usa o cache em disco por ticker e agrupa o que falta em chamadas `yf.download`
+    de até `chunk_size` símbolos: tickers sem cache (ou sem cobertura do período)
+    baixam o período inteiro; tickers com cache vencido baixam só a cauda, a partir
+    do candle salvo mais antigo do grupo. Retorna `{ticker: DataFrame}` na ordem de
+    entrada (frame vazio quando o Yahoo não devolve dados).
+    """
+    source = get_history_provider(provider)
+    end_dt = datetime.now()
+    start = (end_dt - timedelta(days=days_back)).date().isoformat()
+    end = end_dt.date().isoformat()
+    if not source.cacheable:
+        return source.download_many(tickers, start, end, interval, auto_adjust)
+
+    result: Dict[str, pd.DataFrame] = {}
+    cached: Dict[str, Tuple[pd.DataFrame, Dict[str, Any]]] = {}
+    full: List[str] = []
+    stale: List[str] = []
+    for t in tickers:
+        path = history_cache_path(t, interval, auto_adjust, source.name)
+        with _file_lock(path, exclusive=False):
+            meta = _read_cache_meta(path)
+            df = pd.read_parquet(path) if meta is not None and path.exists() else None
+        if df is None or df.empty or meta["start"] > start:
+            full.append(t)
+        elif is_cache_fresh(meta, interval):
+            result[t] = df
+        else:
+            cached[t] = (df, meta)
+            stale.append(t)
+
+    def chunks(items: List[str]) -> Iterator[List[str]]:
+        for i in range(0, len(items), max(1, chunk_size)):
+            yield items[i : i + max(1, chunk_size)]
+
+    for group in chunks(full):
+        fetched = source.download_many(group, start, end, interval, auto_adjust)
+        for t in group:
+            df = fetched.get(t, pd.DataFrame())
+            if not df.empty:
+                path = history_cache_path(t, interval, auto_adjust, source.name)
+                with _file_lock(path):
+                    _write_history_cache(path, df, start)
+            result[t] = df
+
+    for group in chunks(stale):
+        delta_start = min(cached[t][0].index.max() for t in group).date().isoformat()
+        requested_at = time.time()
+        fetched = source.download_many(group, delta_start, end, interval, auto_adjust)
+        for t in group:
+            old, meta = cached[t]
+            delta = fetched.get(t, pd.DataFrame())
+            if delta.empty:
+                # Ausente ou vazio no lote: mantém o arquivo (e o `fetched_at`) como estava,
+                # para a entrada seguir vencida e ser tentada de novo (ver `refresh_history_delta`)
+                result[t] = old
+                continue
+            merged = _merge_history([old, delta])
+            path = history_cache_path(t, interval, auto_adjust, source.name)
+            with _file_lock(path):
+                _write_history_cache(path, merged, str(meta["start"]), requested_at)
+            result[t] = merged
+
+    return {t: _slice_from(result[t], start) for t in tickers}
+
+
+# ============================
+# Ingestão de uploads (streaming, só a cauda)
+# ============================
+UPLOAD_CHUNK_ROWS = int(os.getenv("UPLOAD_CHUNK_ROWS", "100000"))  # linhas lidas por vez do CSV
+CHART_TAIL_ROWS = 200  # pontos de histórico no gráfico combinado histórico + previsões
+
+
+class MissingColumnsError(ValueError):
+    """Arquivo sem alguma das colunas OHLCV obrigatórias."""
+
+
+def resolve_ohlcv_columns(columns: Any) -> Dict[str, str]:
+    """Mapeia nomes canônicos (Open…Volume, Date) para os nomes do arquivo, sem distinção de caixa.
+
+    Levanta `MissingColumnsError` se faltar alguma coluna OHLCV; `Date` é opcional.
+    """
+    cols_map = {str(c).lower(): c for c in columns}
+    if not all(c.lower() in cols_map for c in OHLCV_COLUMNS):
+        raise MissingColumnsError("CSV deve conter colunas: Open, High, Low, Close, Volume")
+    mapping = {c: cols_map[c.lower()] for c in OHLCV_COLUMNS}
+    if "date" in cols_map:
+        mapping["Date"] = cols_map["date"]
+    return mapping
+
+
+def _normalize_chunk(chunk: pd.DataFrame, mapping: Dict[str, str]) -> pd.DataFrame:
+    if "Date" in mapping:
+        chunk = chunk.set_index(pd.to_datetime(chunk[mapping["Date"]]).rename("Date"))
+    chunk = chunk.rename(columns={v: k for k, v in mapping.items() if k != "Date"})
+    return chunk[list(OHLCV_COLUMNS)].dropna()
+
+
+def _keep_tail(
+    chunks: Iterator[pd.DataFrame], keep: Optional[int], by_date: bool, overview: Optional[CloseOverview] = None
+) -> pd.DataFrame:
+    """Acumula blocos normalizados guardando só as `keep` linhas mais recentes (todas se `None`).
+
+    Com `by_date`, "mais recentes" são as maiores datas (arquivo pode estar fora de ordem);
+    sem data, as últimas linhas do arquivo. `overview`, se passado, recebe cada bloco para
+    o gráfico do arquivo inteiro (ver `CloseOverview`).
+    """
+    tail: Optional[pd.DataFrame] = None
+    for chunk in chunks:
+        if overview is not None:
+            overview.add(chunk["Close"])
+        tail = chunk if tail is None else pd.concat([tail, chunk])
+        if keep is not None:
+            if by_date:
+                tail = tail.sort_index(kind="stable")
+            tail = tail.iloc[-keep:]
+    if tail is None:
+        return pd.DataFrame(columns=list(OHLCV_COLUMNS))
+    return tail.sort_index(kind="stable") if by_date else tail
+
+
+def read_csv_tail(
+    buf: Any, keep: Optional[int], chunksize: int = UPLOAD_CHUNK_ROWS, overview: Optional[CloseOverview] = None
+) -> pd.DataFrame:
+    """Lê um CSV OHLCV em blocos (engine C do pandas) mantendo só as `keep` linhas mais recentes.
+
+    As colunas são validadas pelo cabeçalho antes de ler os dados. Pico de memória do
+    parse ~ `chunksize + keep` linhas, independente do tamanho do arquivo; o `buf` em si é
+    do chamador (um arquivo aberto do disco fica fora da memória, já o `UploadedFile` do
+    Streamlit chega inteiro nela).
+    """
+    mapping = resolve_ohlcv_columns(pd.read_csv(buf, nrows=0).columns)
+    buf.seek(0)
+    chunks = pd.read_csv(buf, usecols=list(mapping.values()), chunksize=chunksize)
+    return _keep_tail((_normalize_chunk(c, mapping) for c in chunks), keep, "Date" in mapping, overview)
+
+
+def _arrow_frames(batches: Iterator[pa.RecordBatch], mapping: Dict[str, str]) -> Iterator[pd.DataFrame]:
+    for batch in batches:
+        # ignore_metadata: não deixar o pandas reconstruir o índice salvo no arquivo
+        yield _normalize_chunk(batch.to_pandas(ignore_metadata=True), mapping)
+
+
+CSV_ARROW_BLOCK_BYTES = 1 << 20  # bloco do leitor CSV do pyarrow (ver `read_csv_tail_arrow`)
+
+
+def read_csv_tail_arrow(buf: Any, keep: Optional[int], overview: Optional[CloseOverview] = None) -> pd.DataFrame:
+    """CSV pelo leitor em streaming do pyarrow (parse multithread), só com as colunas OHLCV/Date.
+
+    O leitor lê vários blocos à frente do consumo; com bloco de 1 MB a memória fica em
+    algumas dezenas de MB para qualquer tamanho de arquivo (com 16 MB crescia junto com ele).
+    """
+    mapping = resolve_ohlcv_columns(pd.read_csv(buf, nrows=0).columns)
+    buf.seek(0)
+    reader = pacsv.open_csv(
+        buf,
+        read_options=pacsv.ReadOptions(use_threads=True, block_size=CSV_ARROW_BLOCK_BYTES),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=list(mapping.values()),
+            column_types={mapping[c]: pa.float64() for c in OHLCV_COLUMNS},
+        ),
+    )
+    return _keep_tail(_arrow_frames(iter(reader), mapping), keep, "Date" in mapping, overview)
+
+
+COLUMNAR_SUFFIXES = (".parquet", ".feather", ".arrow", ".ipc")
+UPLOAD_SUFFIXES = ("csv",) + tuple(s.lstrip(".") for s in COLUMNAR_SUFFIXES)
+
+
+def read_ohlcv_tail(
+    buf: Any, name: str, keep: Optional[int] = None, overview: Optional[CloseOverview] = None
+) -> pd.DataFrame:
+    """Lê CSV, Parquet, Feather ou Arrow IPC com projeção só das colunas OHLCV (+ Date).
+
+    - Parquet: `iter_batches` lendo apenas as colunas necessárias;
+    - Feather v2 / Arrow IPC: batches do arquivo IPC, selecionando as colunas;
+    - CSV: leitor do pyarrow (multithread); se ele recusar o arquivo, cai para o pandas.
+    Em todos os casos só as `keep` linhas mais recentes ficam em memória; com `overview`,
+    o Close do arquivo inteiro também sai decimado para o gráfico.
+    """
+    suffix = Path(name).suffix.lower()
+    if suffix == ".parquet":
+        pf = pq.ParquetFile(buf)
+        mapping = resolve_ohlcv_columns(pf.schema_arrow.names)
+        batches = pf.iter_batches(columns=list(mapping.values()))
+        return _keep_tail(_arrow_frames(batches, mapping), keep, "Date" in mapping, overview)
+    if suffix in (".feather", ".arrow", ".ipc"):
+        ipc = pa.ipc.open_file(buf)
+        mapping = resolve_ohlcv_columns(ipc.schema.names)
+        cols = list(mapping.values())
+        batches = (ipc.get_batch(i).select(cols) for i in range(ipc.num_record_batches))
+        return _keep_tail(_arrow_frames(batches, mapping), keep, "Date" in mapping, overview)
+    try:
+        return read_csv_tail_arrow(buf, keep, overview)
+    except pa.ArrowInvalid:
+        buf.seek(0)
+        if overview is not None:
+            overview.reset()  # o pyarrow pode ter falhado no meio do arquivo
+        return read_csv_tail(buf, keep, overview=overview)
+
+
+# Arquivos grandes demais para o upload do navegador: o `st.file_uploader` entrega o arquivo
+# inteiro em memória (limite em `.streamlit/config.toml`); daqui a leitura é direto do disco
+UPLOAD_SERVER_DIR = os.getenv("UPLOAD_SERVER_DIR", "./data/uploads")
+
+
+def list_server_uploads(root: str = UPLOAD_SERVER_DIR) -> List[str]:
+    """Arquivos OHLCV em `root` (nomes relativos, ordenados) para leitura em streaming do disco."""
+    base = Path(root)
+    if not base.is_dir():
+        return []
+    return sorted(
+        str(p.relative_to(base))
+        for p in base.rglob("*")
+        if p.is_file() and not p.name.startswith(".") and p.suffix.lower().lstrip(".") in UPLOAD_SUFFIXES
+    )
+
+
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", "8"))  # arquivos lidos em paralelo no upload em lote
+
+
+def _upload_members(files: List[Any], stack: ExitStack) -> List[Tuple[str, Callable[[], Any]]]:
+    """Lista (nome, abridor) de cada arquivo do lote, expandindo .zip (um ticker por arquivo).
+
+    O abridor devolve um context manager. Membros de zip saem de `zf.open`, que descomprime
+    em streaming dentro das threads de leitura (sem o membro inteiro em memória). Os zips
+    ficam abertos no `stack` e são fechados quando o chamador sai dele. Membros dentro de
+    pastas levam o caminho no nome, para os erros apontarem o arquivo certo.
+    """
+    members: List[Tuple[str, Callable[[], Any]]] = []
+    for f in files:
+        if not f.name.lower().endswith(".zip"):
+            members.append((f.name, lambda f=f: nullcontext(f)))
+            continue
+        zf = stack.enter_context(zipfile.ZipFile(f))
+        for info in zf.infolist():
+            base = Path(info.filename).name
+            if info.is_dir() or base.startswith(".") or info.filename.startswith("__MACOSX/"):
+                continue
+            if Path(base).suffix.lower().lstrip(".") in UPLOAD_SUFFIXES:
+                members.append((info.filename, lambda zf=zf, info=info: zf.open(info)))
+    return members
+
+
+def parse_uploads(
+    files: List[Any], keep: Optional[int], workers: int = UPLOAD_WORKERS
+) -> Tuple[Dict[str, pd.DataFrame], Dict[str, str]]:
+    """Lê vários arquivos/zip em paralelo com a mesma normalização do upload individual.
+
+    Retorna `({TICKER: DataFrame}, {arquivo: erro})`; o ticker é o nome do arquivo sem extensão.
+    Dois arquivos com o mesmo ticker não se sobrescrevem: vale o primeiro e os demais
+    entram nos erros.
+    """
+
+    def read(member: Tuple[str, Callable[[], Any]]) -> pd.DataFrame:
+        name, opener = member
+        with opener() as fh:
+            return read_ohlcv_tail(fh, name, keep)
+
+    frames: Dict[str, pd.DataFrame] = {}
+    errors: Dict[str, str] = {}
+    with ExitStack() as stack:
+        owners: Dict[str, str] = {}
+        unique: List[Tuple[str, Callable[[], Any]]] = []
+        for name, opener in _upload_members(files, stack):
+            ticker = Path(name).stem.upper()
+            if ticker in owners:
+                errors[name] = f"ticker {ticker} repetido (já lido de {owners[ticker]})"
+                continue
+            owners[ticker] = name
+            unique.append((name, opener))
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            futures = [(name, pool.submit(read, (name, opener))) for name, opener in unique]
+            for name, fut in futures:
+                try:
+                    df = fut.result()
+                except Exception as exc:  # noqa: BLE001 – um arquivo ruim não derruba o lote
+                    errors[name] = str(exc)
+                    continue
+                if df.empty or not isinstance(df.index, pd.DatetimeIndex):
+                    errors[name] = "sem linhas válidas ou sem coluna Date"
+                    continue
+                frames[Path(name).stem.upper()] = df
+    return frames, errors
+
+
+# ============================
+# Decimação de séries para gráficos
+# ============================
+CHART_MAX_POINTS = int(os.getenv("CHART_MAX_POINTS", "2000"))
+CHART_DECIMATION = os.getenv("CHART_DECIMATION", "lttb")  # lttb | minmax
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: índices de `n_out` pontos que preservam a forma da série.
+
+    Primeiro e último pontos são sempre mantidos; cada bucket intermediário contribui
+    com o ponto que forma o maior triângulo com o ponto escolhido antes e a média do
+    bucket seguinte. O laço é por bucket (vetorizado dentro dele).
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)  # n_out - 2 buckets
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], max(edges[i + 1], edges[i] + 1)
+        if i + 2 < len(edges):
+            nxt = slice(edges[i + 1], edges[i + 2])
+            avg_x, avg_y = x[nxt].mean(), y[nxt].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def minmax_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """Mín./máx. por bucket (`(n_out - 2) // 2` buckets + extremos): preserva picos e vales, vetorizado."""
+    n = len(y)
+    if n_out >= n or n_out < 4:
+        return np.arange(n)
+    buckets = np.arange(n) * ((n_out - 2) // 2) // n
+    grouped = pd.Series(y).groupby(buckets)
+    idx = np.concatenate([grouped.idxmin().to_numpy(), grouped.idxmax().to_numpy(), [0, n - 1]])
+    return np.unique(idx)
+
+
+def decimate_series(s: pd.Series, max_points: int = CHART_MAX_POINTS, method: str = CHART_DECIMATION) -> pd.Series:
+    """Reduz a série para no máximo ~`max_points` pontos antes de enviá-la ao navegador."""
+    s = s.dropna()
+    if len(s) <= max_points:
+        return s
+    y = s.to_numpy(dtype="float64")
+    if method == "minmax":
+        idx = minmax_indices(y, max_points)
+    else:
+        # x real dos pontos: datas, ou posições numéricas esparsas (ex.: parciais de
+        # `CloseOverview` sem Date); só índices não numéricos caem para espaçamento uniforme
+        index = s.index
+        if isinstance(index, pd.DatetimeIndex):
+            x = index.asi8.astype("float64")
+        elif pd.api.types.is_numeric_dtype(index):
+            x = index.to_numpy(dtype="float64")
+        else:
+            x = np.arange(len(s), dtype="float64")
+        idx = lttb_indices(x, y, max_points)
+    return s.iloc[idx]
 
 
-def api_health(api_url: str) -> Tuple[Optional[Dict[str, Any]], float, Optional[str]]:
-    return _request("GET", f"{api_url.rstrip('/')}/health")
+class CloseOverview:
+    """Close do arquivo inteiro, decimado bloco a bloco durante a leitura em streaming.
 
+    Os leitores de upload guardam só a cauda (`keep` linhas, abaixo de qualquer orçamento
+    de pontos), então decimar o `history_df` não tem efeito. Aqui cada bloco é reduzido a
+    `max_points` e o acumulado é recompactado quando passa de 4×, mantendo a memória
+    proporcional ao orçamento do gráfico, não ao arquivo.
+    """
 
-def api_metadata(api_url: str) -> Tuple[Optional[Dict[str, Any]], float, Optional[str]]:
-    return _request("GET", f"{api_url.rstrip('/')}/metadata")
+    def __init__(self, max_points: int = CHART_MAX_POINTS, method: str = CHART_DECIMATION) -> None:
+        self.max_points = max_points
+        self.method = method
+        self.reset()
 
+    def reset(self) -> None:
+        self._parts: List[pd.Series] = []
+        self._points = 0
+        self._rows = 0
 
-def api_predict(api_url: str, payload: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], float, Optional[str]]:
-    return _request("POST", f"{api_url.rstrip('/')}/predict", json_payload=payload)
+    def add(self, close: pd.Series) -> None:
+        if not isinstance(close.index, pd.DatetimeIndex):
+            # Sem Date, o índice de cada bloco recomeça (pyarrow): posição global no arquivo
+            close = pd.Series(close.to_numpy(), index=pd.RangeIndex(self._rows, self._rows + len(close)))
+        self._rows += len(close)
+        part = decimate_series(close, self.max_points, self.method)
+        self._parts.append(part)
+        self._points += len(part)
+        if self._points > 4 * self.max_points:
+            self._parts = [self.series()]
+            self._points = len(self._parts[0])
 
+    def series(self) -> pd.Series:
+        if not self._parts:
+            return pd.Series(dtype="float64", name="Close")
+        merged = pd.concat(self._parts).sort_index(kind="stable")
+        return decimate_series(merged, self.max_points, self.method).rename("Close")
 
-# ============================
-# Dados auxiliares via yfinance (opcional)
-# ============================
-@st.cache_data(show_spinner=False)
-def fetch_history_yf(ticker: str, days_back: int = 400) -> pd.DataFrame:
-    """Busca OHLCV recente pelo yfinance para visualização e/ou envio ao backend.
 
-    days_back: janela de histórico para exibir/usar (aprox.).
-    Retorna DataFrame com colunas padrão do Yahoo (Open, High, Low, Close, Volume).
-    """
-    end = datetime.now()
-    start = end - timedelta(days=days_back)
-    df = yf.download(ticker, start=start.date().isoformat(), end=end.date().isoformat(), interval="1d", auto_adjust=False)
-    if not isinstance(df, pd.DataFrame) or df.empty:
-        return pd.DataFrame()
-    df = df[['Open', 'High', 'Low', 'Close', 'Volume']].dropna().copy()
-    df.index = pd.to_datetime(df.index)
-    df.sort_index(inplace=True)
-    return df
+# Formatos do campo `history` aceitos pelo backend (anunciados em `/metadata`)
+HISTORY_FORMAT_RECORDS = "records"    # lista de dicts por dia (padrão, sempre aceito)
+HISTORY_FORMAT_COLUMNAR = "columnar"  # dict de listas por coluna (chaves não se repetem)
+_PAYLOAD_KEYS = ("open", "high", "low", "close", "volume")
 
 
-def build_payload_from_df(df: pd.DataFrame, window: int, horizon: int, ticker: Optional[str] = None) -> Dict[str, Any]:
+def build_payload_from_df(
+    df: pd.DataFrame,
+    window: int,
+    horizon: int,
+    ticker: Optional[str] = None,
+    history_format: str = HISTORY_FORMAT_RECORDS,
+) -> Dict[str, Any]:
     """Prepara um payload de previsão com base em um DataFrame OHLCV.
 
     Formato pensado para alinhar com o `schemas.py` do backend:
@@ -110,106 +1787,814 @@ def build_payload_from_df(df: pd.DataFrame, window: int, horizon: int, ticker: O
             ...
           ]
         }
+
+    Com `history_format="columnar"` (só quando o `/metadata` anuncia suporte), o
+    histórico vai por coluna e o payload ganha `"history_format": "columnar"`:
+        "history": {"date": [...], "open": [...], "high": [...], "low": [...],
+                    "close": [...], "volume": [...]}
     """
     tail = df.tail(window)
-    records = [
-        {
-            "date": idx.strftime("%Y-%m-%d"),
-            "open": float(row["Open"]),
-            "high": float(row["High"]),
-            "low": float(row["Low"]),
-            "close": float(row["Close"]),
-            "volume": float(row["Volume"]),
-        }
-        for idx, row in tail.iterrows()
-    ]
-    payload: Dict[str, Any] = {"horizon": int(horizon), "window": int(window), "history": records}
+    # Caminho vetorizado: uma conversão por coluna (float64) em vez de `iterrows` + `float()`
+    # por célula. `tolist()` devolve floats Python, então o JSON sai idêntico ao anterior.
+    dates = tail.index.strftime("%Y-%m-%d").tolist()
+    values = tail[list(OHLCV_COLUMNS)].to_numpy(dtype="float64")
+    history: Any
+    if history_format == HISTORY_FORMAT_COLUMNAR:
+        history = {"date": dates, **dict(zip(_PAYLOAD_KEYS, values.T.tolist()))}
+    else:
+        history = [
+            {"date": date, "open": o, "high": h, "low": lo, "close": c, "volume": v}
+            for date, (o, h, lo, c, v) in zip(dates, values.tolist())
+        ]
+    payload: Dict[str, Any] = {"horizon": int(horizon), "window": int(window), "history": history}
+    if history_format == HISTORY_FORMAT_COLUMNAR:
+        payload["history_format"] = HISTORY_FORMAT_COLUMNAR
     if ticker:
         payload["ticker"] = ticker
     return payload
 
 
+def payload_to_records(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Converte um payload colunar de volta para o formato de registros (fallback)."""
+    if payload.get("history_format") != HISTORY_FORMAT_COLUMNAR:
+        return payload
+    cols = payload["history"]
+    keys = ("date",) + _PAYLOAD_KEYS
+    records = [dict(zip(keys, row)) for row in zip(*(cols[k] for k in keys))]
+    out = {k: v for k, v in payload.items() if k != "history_format"}
+    out["history"] = records
+    return out
+
+
+def payload_history_frame(payload: Dict[str, Any]) -> pd.DataFrame:
+    """Histórico do payload (registros ou colunar) de volta em OHLCV (`OHLCV_COLUMNS`, índice de datas)."""
+    history = payload["history"]
+    cols = history if isinstance(history, dict) else {k: [row.get(k) for row in history] for k in ("date",) + _PAYLOAD_KEYS}
+    df = pd.DataFrame({col: np.asarray(cols[key], dtype=np.float64) for col, key in zip(OHLCV_COLUMNS, _PAYLOAD_KEYS)})
+    if cols.get("date"):
+        df.index = pd.DatetimeIndex(pd.to_datetime(cols["date"]), name="Date")
+    return df
+
+
+def negotiate_history_format(metadata: Optional[Dict[str, Any]]) -> str:
+    """Escolhe o formato do histórico a partir do `/metadata` (ex.: `"history_formats": ["records", "columnar"]`).
+
+    Sem metadata ou sem anúncio explícito, usa o formato de registros.
+    """
+    if isinstance(metadata, dict):
+        formats = metadata.get("history_formats")
+        if isinstance(formats, list) and HISTORY_FORMAT_COLUMNAR in formats:
+            return HISTORY_FORMAT_COLUMNAR
+    return HISTORY_FORMAT_RECORDS
+
+
+# Respostas que indicam formato não suportado pelo backend (e não falha da API)
+FORMAT_REJECTED_STATUS = frozenset({400, 415, 422})
+
+
+def format_rejected(payload: Dict[str, Any], result: ApiResult) -> bool:
+    """Indica se `result` é a recusa do histórico colunar de `payload` (e vale reenviar em registros).
+
+    Só 400/415/422 contam; timeout, falha de conexão e 5xx voltam como vieram, para não
+    dobrar a carga de uma API que já está com problema.
+    """
+    _, lat, err = result
+    return (
+        bool(err)
+        and payload.get("history_format") == HISTORY_FORMAT_COLUMNAR
+        and getattr(lat, "status", 0) in FORMAT_REJECTED_STATUS
+    )
+
+
+def api_predict_with_fallback(api_url: str, payload: Dict[str, Any], body: Optional[bytes] = None) -> ApiResult:
+    """`/predict` que reenvia no formato de registros se o backend recusar o colunar."""
+    result = api_predict(api_url, payload, body)
+    if format_rejected(payload, result):
+        return api_predict(api_url, payload_to_records(payload))
+    return result
+
+
+PREVIEW_ROWS = 12  # linhas do histórico mostradas na prévia do payload
+
+
+def preview_payload(payload: Dict[str, Any], limit: int = 2000) -> str:
+    """Prévia legível do payload sem pretty-print da estrutura inteira.
+
+    Apenas as primeiras `PREVIEW_ROWS` linhas do histórico entram na visão (em qualquer
+    formato); o restante é resumido em um comentário ao final.
+    """
+    history = payload.get("history")
+    view = payload
+    n_rows = 0
+    if isinstance(history, list):
+        n_rows = len(history)
+        view = {**payload, "history": history[:PREVIEW_ROWS]}
+    elif isinstance(history, dict):
+        n_rows = len(history.get("date", []))
+        view = {**payload, "history": {k: v[:PREVIEW_ROWS] for k, v in history.items()}}
+    text = orjson.dumps(view, option=orjson.OPT_INDENT_2).decode()[:limit]
+    if n_rows > PREVIEW_ROWS:
+        text += f"\n// … +{n_rows - PREVIEW_ROWS} linhas de histórico omitidas"
+    return text
+
+
+# ============================
+# Cache de previsões (LRU em memória + disco)
+# ============================
+def model_version(metadata: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Versão do modelo anunciada no `/metadata` (`model_version` ou `version`).
+
+    Sem esses campos, usa um hash do próprio `/metadata`: qualquer mudança nele também
+    invalida o cache. Sem metadata não dá para garantir que a resposta guardada é do
+    modelo atual, então devolve None (e o cache não é usado).
+    """
+    if not metadata:
+        return None
+    version = metadata.get("model_version") or metadata.get("version")
+    if version is not None:
+        return str(version)
+    return hashlib.blake2b(orjson.dumps(metadata, option=orjson.OPT_SORT_KEYS), digest_size=8).hexdigest()
+
+
+def prediction_cache_key(api_url: str, body: bytes, version: str, as_of: str = "") -> str:
+    """blake2b de (versão do modelo, URL da API, bytes do payload, `as_of`), com tamanho como separador.
+
+    `as_of` entra quando o payload não fixa os dados de entrada (ver `cached_api_predict`).
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for part in (version.encode(), api_url.rstrip("/").encode(), body, as_of.encode()):
+        h.update(len(part).to_bytes(8, "little"))
+        h.update(part)
+    return h.hexdigest()
+
+
+class PredictionCache:
+    """Respostas do `/predict` por conteúdo do payload + versão do modelo.
+
+    Dois níveis: LRU em memória (por processo, `PREDICT_CACHE_SIZE` entradas) e um JSON
+    por chave em `<PREDICT_CACHE_DIR>/<versão>/`, compartilhado entre processos. A versão
+    já faz parte da chave, então a memória não é esvaziada quando ela muda: sessões com
+    APIs em versões diferentes convivem na mesma LRU e entradas de um modelo antigo saem
+    por desuso. No disco nada é apagado por versão (num deploy gradual, réplicas ainda no
+    modelo antigo usam a pasta dele): JSONs com mais de `max_age` segundos contam como
+    ausentes e são removidos na varredura (`_sweep`), feita na primeira vez que uma versão
+    aparece e no máximo uma vez por hora.
+    """
+
+    SWEEP_INTERVAL = 3600.0
+
+    def __init__(
+        self, maxsize: int = PREDICT_CACHE_SIZE, root: str = PREDICT_CACHE_DIR, max_age: int = PREDICT_CACHE_MAX_AGE
+    ) -> None:
+        self._entries: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+        self._maxsize = maxsize
+        self._root = Path(root)
+        self._max_age = max_age
+        self._versions: Set[str] = set()
+        self._last_sweep = 0.0
+        self._guard = threading.Lock()
+
+    def _version_dir(self, version: str) -> Path:
+        return self._root / "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in version)
+
+    def _use_version(self, version: str) -> None:
+        with self._guard:
+            new = version not in self._versions
+            self._versions.add(version)
+            due = new or time.time() - self._last_sweep > self.SWEEP_INTERVAL
+            if due:
+                self._last_sweep = time.time()
+        if due:
+            self._sweep()
+
+    def _sweep(self) -> None:
+        """Remove JSONs expirados de todas as versões e as pastas que ficarem vazias."""
+        if not self._root.is_dir():
+            return
+        cutoff = time.time() - self._max_age
+        for version_dir in self._root.iterdir():
+            if not version_dir.is_dir():
+                continue
+            for path in version_dir.glob("*.json"):
+                try:
+                    if path.stat().st_mtime < cutoff:
+                        path.unlink()
+                except OSError:
+                    pass  # outro processo removeu ou regravou no meio da varredura
+            try:
+                version_dir.rmdir()  # só sai se estiver vazia
+            except OSError:
+                pass
+
+    def _remember(self, key: str, version: str, data: Dict[str, Any]) -> None:
+        with self._guard:
+            self._entries[(version, key)] = data
+            self._entries.move_to_end((version, key))
+            while len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+
+    def get(self, key: str, version: str) -> Optional[Dict[str, Any]]:
+        self._use_version(version)
+        with self._guard:
+            data = self._entries.get((version, key))
+            if data is not None:
+                self._entries.move_to_end((version, key))
+                return data
+        path = self._version_dir(version) / f"{key}.json"
+        try:
+            if time.time() - path.stat().st_mtime > self._max_age:
+                return None
+            data = orjson.loads(path.read_bytes())
+        except (OSError, orjson.JSONDecodeError):
+            return None
+        self._remember(key, version, data)
+        return data
+
+    def put(self, key: str, version: str, data: Dict[str, Any]) -> None:
+        self._use_version(version)
+        self._remember(key, version, data)
+        path = self._version_dir(version) / f"{key}.json"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        _atomic_write(path, lambda tmp: tmp.write_bytes(orjson.dumps(data)))
+
+
+@st.cache_resource(show_spinner=False)
+def prediction_cache() -> PredictionCache:
+    return PredictionCache()
+
+
+def cached_api_predict(api_url: str, payload: Dict[str, Any], body: Optional[bytes] = None) -> ApiResult:
+    """`api_predict_with_fallback` com cache por conteúdo + versão do modelo.
+
+    A versão vem do `cached_api_metadata` (TTL de 60 s), então um modelo novo passa a
+    valer no máximo um minuto depois do deploy. Só respostas sem erro são guardadas.
+    Sem `history` (modo "API busca") o payload é só ticker/janela/horizonte e a API usa
+    os candles mais recentes; a chave ganha o último pregão encerrado para a previsão
+    mudar quando sai um candle novo.
+    """
+    version = model_version(cached_api_metadata(api_url))
+    if version is None:
+        return api_predict_with_fallback(api_url, payload, body)
+    body = body if body is not None else encode_payload(payload)
+    as_of = "" if "history" in payload else last_session_close().isoformat()
+    key = prediction_cache_key(api_url, body, version, as_of)
+    cache = prediction_cache()
+    t0 = time.perf_counter()
+    data = cache.get(key, version)
+    if data is not None:
+        return data, RequestTiming(time.perf_counter() - t0, from_cache=True), None
+    data, lat, err = api_predict_with_fallback(api_url, payload, body)
+    if not err and data:
+        cache.put(key, version, data)
+    return data, lat, err
+
+
+# ============================
+# Inferência em processo (sem HTTP)
+# ============================
+BACKEND_HTTP = "HTTP (API)"
+BACKEND_IN_PROCESS = "Em processo"
+BACKEND_COMPARE = "Comparar HTTP × em processo"
+_OHLCV_FEATURES = _PAYLOAD_KEYS  # ordem das features quando o scaler foi ajustado em OHLCV
+
+
+def _attr_str(value: Any) -> str:
+    return value.decode() if isinstance(value, bytes) else str(value)
+
+
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    return 0.5 * (np.tanh(0.5 * x) + 1.0)  # estável para |x| grande, sem overflow no exp
+
+
+_ACTIVATIONS: Dict[str, Callable[[np.ndarray], np.ndarray]] = {
+    "linear": lambda x: x,
+    "tanh": np.tanh,
+    "sigmoid": _sigmoid,
+    "relu": lambda x: np.maximum(x, 0.0),
+    # Keras 2: clip(0.2x + 0.5); Keras 3 usa relu6(x + 3) / 6 (ver `NumpyLSTMModel.from_h5`)
+    "hard_sigmoid": lambda x: np.clip(0.2 * x + 0.5, 0.0, 1.0),
+    "hard_sigmoid_k3": lambda x: np.clip(x / 6.0 + 0.5, 0.0, 1.0),
+}
+
+
+def _activation(value: Any, layer: str) -> str:
+    """Nome de ativação suportado pelo motor NumPy; qualquer outro falha já na extração."""
+    if not isinstance(value, str) or value not in _ACTIVATIONS:
+        supported = ", ".join(k for k in _ACTIVATIONS if k != "hard_sigmoid_k3")
+        raise ValueError(f"ativação {value!r} da camada {layer} não suportada pelo motor NumPy (use {supported})")
+    return value
+
+
+def extract_keras_h5(h5_path: str) -> Tuple[List[Dict[str, Any]], Dict[str, np.ndarray]]:
+    """Lê um modelo Keras `.h5` só com h5py: configuração das camadas + pesos em float32.
+
+    Usa o `model_config` (JSON) para a ordem e os parâmetros das camadas e os atributos
+    `layer_names`/`weight_names` de `model_weights` para achar os pesos de cada uma.
+    Camadas e ativações não suportadas levantam `ValueError` aqui, não no forward.
+    """
+    import h5py
+
+    with h5py.File(h5_path, "r") as f:
+        config = orjson.loads(_attr_str(f.attrs["model_config"]))
+        keras3 = _attr_str(f.attrs.get("keras_version", "2")).startswith("3")
+        group = f["model_weights"] if "model_weights" in f else f
+        layer_names = [_attr_str(n) for n in group.attrs["layer_names"]]
+        weights: Dict[str, np.ndarray] = {}
+        for name in layer_names:
+            layer = group[name]
+            for i, wname in enumerate(_attr_str(w) for w in layer.attrs["weight_names"]):
+                weights[f"{name}/{i}"] = np.asarray(layer[wname], dtype=np.float32)
+
+    layers: List[Dict[str, Any]] = []
+    for spec in config["config"]["layers"]:
+        cls, cfg = spec["class_name"], spec["config"]
+        if cls in ("InputLayer", "Dropout", "SpatialDropout1D", "GaussianNoise", "ActivityRegularization"):
+            continue  # sem efeito na inferência
+        if cls not in ("LSTM", "Dense"):
+            raise ValueError(f"camada {cls} não suportada pelo motor NumPy")
+        name = cfg["name"]
+        layer: Dict[str, Any] = {"class": cls, "name": name, "activation": _activation(cfg.get("activation", "linear"), name)}
+        if cls == "LSTM":
+            recurrent = _activation(cfg.get("recurrent_activation", "sigmoid"), name)
+            if recurrent == "hard_sigmoid" and keras3:
+                recurrent = "hard_sigmoid_k3"
+            layer.update(
+                units=int(cfg["units"]),
+                recurrent_activation=recurrent,
+                return_sequences=bool(cfg.get("return_sequences", False)),
+                go_backwards=bool(cfg.get("go_backwards", False)),
+            )
+        layer["use_bias"] = bool(cfg.get("use_bias", True))
+        layers.append(layer)
+    return layers, weights
+
+
+class NumpyLSTMModel:
+    """Forward pass de LSTM(s) + Dense em NumPy puro, vetorizado sobre o lote de janelas.
+
+    Pesos no layout do Keras: `kernel` (F, 4U), `recurrent_kernel` (U, 4U) e `bias` (4U),
+    com os gates na ordem i, f, c, o. A projeção da entrada é feita para todos os passos
+    em um único matmul; só a recorrência (h @ U) percorre o tempo.
+    """
+
+    def __init__(self, layers: List[Dict[str, Any]], weights: Dict[str, np.ndarray]) -> None:
+        self.layers = layers
+        self.weights = weights
+
+    @classmethod
+    def from_h5(cls, h5_path: str) -> "NumpyLSTMModel":
+        """Carrega o `.npz` ao lado do `.h5`; extrai e grava o `.npz` se faltar ou estiver velho.
+
+        Em diretório de modelos só leitura o `.npz` não é gravado: os pesos extraídos ficam
+        só em memória e a extração se repete no próximo carregamento.
+        """
+        h5 = Path(h5_path)
+        npz = h5.with_suffix(".npz")
+        if npz.exists() and npz.stat().st_mtime >= h5.stat().st_mtime:
+            with np.load(npz, allow_pickle=False) as data:
+                layers = orjson.loads(str(data["__layers__"]))
+                weights = {k: data[k] for k in data.files if k != "__layers__"}
+            return cls(layers, weights)
+        layers, weights = extract_keras_h5(str(h5))
+
+        def write(tmp: Path) -> None:
+            with tmp.open("wb") as fh:  # arquivo aberto: `np.savez` não acrescenta ".npz" ao nome temporário
+                np.savez(fh, __layers__=np.array(orjson.dumps(layers).decode()), **weights)
+
+        try:
+            _atomic_write(npz, write)
+        except OSError:
+            pass  # ex.: volume de modelos montado só leitura
+        return cls(layers, weights)
+
+    def _layer_weights(self, layer: Dict[str, Any]) -> List[np.ndarray]:
+        name, out = layer["name"], []
+        while f"{name}/{len(out)}" in self.weights:
+            out.append(self.weights[f"{name}/{len(out)}"])
+        return out
+
+    def _lstm(self, x: np.ndarray, layer: Dict[str, Any]) -> np.ndarray:
+        w = self._layer_weights(layer)
+        kernel, recurrent = w[0], w[1]
+        bias = w[2] if layer["use_bias"] else np.zeros(kernel.shape[1], dtype=np.float32)
+        units = layer["units"]
+        act = _ACTIVATIONS[layer["activation"]]
+        rec_act = _ACTIVATIONS[layer["recurrent_activation"]]
+        if layer.get("go_backwards"):
+            x = x[:, ::-1]
+        b, steps, _ = x.shape
+        # (B, T, F) @ (F, 4U): entrada de todos os passos de uma vez
+        xz = x @ kernel + bias
+        h = np.zeros((b, units), dtype=np.float32)
+        c = np.zeros((b, units), dtype=np.float32)
+        seq = np.empty((b, steps, units), dtype=np.float32) if layer["return_sequences"] else None
+        for t in range(steps):
+            z = xz[:, t] + h @ recurrent
+            i = rec_act(z[:, :units])
+            f = rec_act(z[:, units : 2 * units])
+            g = act(z[:, 2 * units : 3 * units])
+            o = rec_act(z[:, 3 * units :])
+            c = f * c + i * g
+            h = o * act(c)
+            if seq is not None:
+                seq[:, t] = h
+        return seq if seq is not None else h
+
+    def _dense(self, x: np.ndarray, layer: Dict[str, Any]) -> np.ndarray:
+        w = self._layer_weights(layer)
+        y = x @ w[0]
+        if layer["use_bias"]:
+            y = y + w[1]
+        return _ACTIVATIONS[layer["activation"]](y)
+
+    def __call__(self, x: np.ndarray, training: bool = False) -> np.ndarray:
+        out = np.asarray(x, dtype=np.float32)
+        for layer in self.layers:
+            out = self._lstm(out, layer) if layer["class"] == "LSTM" else self._dense(out, layer)
+        return out
+
+
+class InProcessModel:
+    """Modelos Keras (H=1 e H=5) + scaler carregados uma vez, previsão direto em arrays.
+
+    Segue o contrato do backend: janela com as features na escala do scaler, saída do
+    modelo = `horizon` valores de `close` escalados, desfeitos com `inverse_transform`.
+    As features vêm de `features` no `metadata.json` do treino; sem isso, o nº de
+    features do scaler decide entre só `close` (1) e OHLCV (5).
+
+    `engine="numpy"` (padrão) roda o `NumpyLSTMModel` a partir de um `.npz` extraído do
+    `.h5`, sem importar TensorFlow; `engine="keras"` usa `keras.models.load_model`.
+    """
+
+    def __init__(
+        self,
+        h1_path: str = MODEL_H1_PATH,
+        h5_path: str = MODEL_H5_PATH,
+        scaler_path: str = SCALER_PATH,
+        metadata_path: str = METADATA_PATH,
+        engine: str = INFERENCE_ENGINE,
+    ) -> None:
+        import joblib  # imports pesados só quando o modo em processo é usado
+
+        if engine == "keras":
+            from tensorflow import keras
+
+            load: Callable[[str], Any] = lambda path: keras.models.load_model(path, compile=False)
+        else:
+            load = NumpyLSTMModel.from_h5
+        self.engine = engine
+        self.scaler = joblib.load(scaler_path)
+        self.models = {
+            horizon: load(path) for horizon, path in ((1, h1_path), (5, h5_path)) if Path(path).exists()
+        }
+        if not self.models:
+            raise FileNotFoundError(f"nenhum modelo encontrado em {h1_path} / {h5_path}")
+        meta: Dict[str, Any] = {}
+        if Path(metadata_path).exists():
+            meta = orjson.loads(Path(metadata_path).read_bytes())
+        self.version = str(meta.get("model_version") or meta.get("version") or "local")
+        features = meta.get("features")
+        if isinstance(features, list) and features:
+            self.features = tuple(str(f).lower() for f in features)
+        else:
+            n = int(getattr(self.scaler, "n_features_in_", len(_OHLCV_FEATURES)))
+            self.features = ("close",) if n == 1 else _OHLCV_FEATURES
+        self.close_idx = self.features.index("close")
+
+    def _forward(self, horizon: int, x: np.ndarray) -> np.ndarray:
+        return np.asarray(self.models[horizon](x, training=False))
+
+    def predict_windows(self, windows: np.ndarray, horizon: int) -> np.ndarray:
+        """(B, window, features) em preços → (B, horizon) em preços."""
+        if horizon not in self.models:
+            raise ValueError(f"sem modelo para horizon={horizon} (disponíveis: {sorted(self.models)})")
+        b, w, f = windows.shape
+        scaled = self.scaler.transform(windows.reshape(b * w, f)).reshape(b, w, f).astype(np.float32)
+        out = self._forward(horizon, scaled).reshape(b, -1)[:, :horizon]
+        # Desfaz a escala só da coluna `close`, reaproveitando o `inverse_transform` do scaler
+        full = np.zeros((out.size, f), dtype=np.float64)
+        full[:, self.close_idx] = out.ravel()
+        return self.scaler.inverse_transform(full)[:, self.close_idx].reshape(out.shape)
+
+    def predict_stacked(self, windows: Sequence[np.ndarray], horizon: int, batch_size: int = INFERENCE_BATCH_SIZE) -> np.ndarray:
+        """Empilha janelas (window, features) em um tensor (B, window, features) e prevê em lote.
+
+        Um forward por bloco de `batch_size` janelas (um só para lotes até esse tamanho);
+        a linha i do resultado (B, horizon) é a previsão da janela i.
+        """
+        stacked = np.stack(windows).astype(np.float64, copy=False)
+        parts = [self.predict_windows(stacked[i : i + batch_size], horizon) for i in range(0, len(stacked), batch_size)]
+        return np.concatenate(parts) if parts else np.empty((0, horizon))
+
+    def window_from_frame(self, df: pd.DataFrame, window: int) -> np.ndarray:
+        """Últimos `window` registros de um OHLCV (ex.: `fetch_history_yf`) nas colunas do modelo."""
+        by_name = {str(c).lower(): c for c in df.columns}
+        missing = [f for f in self.features if f not in by_name]
+        if missing:
+            raise ValueError(f"colunas ausentes: {', '.join(missing)}")
+        if len(df) < window:
+            raise ValueError(f"histórico com {len(df)} linhas; a janela pede {window}")
+        return df[[by_name[f] for f in self.features]].tail(window).to_numpy(dtype=np.float64)
+
+    def predict_frames(
+        self, frames: Sequence[pd.DataFrame], window: int, horizon: int, tickers: Optional[Sequence[Optional[str]]] = None
+    ) -> List[Tuple[Optional[Dict[str, Any]], Optional[str]]]:
+        """Previsão de vários OHLCV com um forward por horizonte; resultados na ordem de entrada.
+
+        Cada item é (resposta no formato do `/predict`, erro); frames inválidos (curtos ou
+        sem as colunas) ficam com erro e não entram no tensor.
+        """
+        results: List[Tuple[Optional[Dict[str, Any]], Optional[str]]] = [(None, None)] * len(frames)
+        windows, positions = [], []
+        for pos, df in enumerate(frames):
+            try:
+                windows.append(self.window_from_frame(df, window))
+                positions.append(pos)
+            except ValueError as exc:
+                results[pos] = (None, str(exc))
+        if windows:
+            preds = self.predict_stacked(windows, horizon)
+            for pos, row in zip(positions, preds):
+                df = frames[pos]
+                results[pos] = (
+                    {
+                        "ticker": tickers[pos] if tickers else None,
+                        "horizon": horizon,
+                        "predictions": row.tolist(),
+                        "last_date": df.index[-1].strftime("%Y-%m-%d") if isinstance(df.index, pd.DatetimeIndex) else None,
+                        "model_version": self.version,
+                    },
+                    None,
+                )
+        return results
+
+    def predict(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Mesmo formato de resposta do `/predict` (via `predict_frames`, lote de um)."""
+        df = payload_history_frame(payload)
+        window = int(payload.get("window") or len(df))
+        data, err = self.predict_frames([df], window, int(payload.get("horizon", 1)), [payload.get("ticker")])[0]
+        if err:
+            raise ValueError(err)
+        return data  # type: ignore[return-value]
+
+
+@st.cache_resource(show_spinner="Carregando modelos…")
+def in_process_model() -> InProcessModel:
+    return InProcessModel()
+
+
+def in_process_predict(payload: Dict[str, Any], provider: str = HISTORY_PROVIDER) -> ApiResult:
+    """Previsão no próprio processo, no contrato (json, tempos, erro) dos helpers de API.
+
+    Payload sem `history` (modo "API busca") tem o histórico buscado aqui, como o backend faria.
+    O tempo medido é só o da inferência (carregar os modelos fica no primeiro uso).
+    """
+    try:
+        model = in_process_model()
+        if "history" in payload:
+            t0 = time.perf_counter()
+            data = model.predict(payload)
+            return data, RequestTiming(time.perf_counter() - t0, in_process=True), None
+        window = int(payload.get("window", 60))
+        df = fetch_history_yf(payload["ticker"], days_back=max(window * 3, 180), provider=provider)
+        if df.empty:
+            return None, RequestTiming(0.0, in_process=True), f"sem histórico para {payload['ticker']} (fonte: {provider})"
+        t0 = time.perf_counter()
+        data, err = model.predict_frames([df], window, int(payload.get("horizon", 1)), [payload["ticker"]])[0]
+        return data, RequestTiming(time.perf_counter() - t0, in_process=True), err
+    except Exception as exc:  # noqa: BLE001 – exibimos erro detalhado na UI
+        return None, RequestTiming(0.0, in_process=True), f"{type(exc).__name__}: {exc}"
+
+
+def predict_watchlist_in_process(payloads: Dict[str, Dict[str, Any]], provider: str = HISTORY_PROVIDER) -> pd.DataFrame:
+    """Equivalente em processo do `predict_watchlist` (mesmas colunas), em lote.
+
+    Cada ticker vira um OHLCV: o histórico do payload ou, no modo "API busca", o que o
+    `fetch_history_bulk` trouxer. Os frames vão para `InProcessModel.predict_frames`, um
+    tensor e um forward por (janela, horizonte). Ticker sem histórico sai com erro
+    explícito. Como no endpoint de lote, a latência de cada ticker é a do lote inteiro.
+    """
+    tickers = list(payloads)
+    errors: Dict[str, str] = {}
+    try:
+        model = in_process_model()
+    except Exception as exc:  # noqa: BLE001 – mesmo erro para todos os tickers
+        errors = dict.fromkeys(tickers, f"{type(exc).__name__}: {exc}")
+        return pd.DataFrame([_batch_row(t, (None, RequestTiming(0.0, in_process=True), errors[t])) for t in tickers])
+
+    frames: Dict[str, pd.DataFrame] = {}
+    fetched: Dict[str, pd.DataFrame] = {}
+    need = [t for t, p in payloads.items() if "history" not in p]
+    if need:
+        window = max(int(payloads[t].get("window", 60)) for t in need)
+        fetched = fetch_history_bulk(
+            [payloads[t]["ticker"] for t in need], days_back=max(window * 3, 180), provider=provider
+        )
+    for t, p in payloads.items():
+        try:
+            df = payload_history_frame(p) if t not in need else fetched.get(p["ticker"], pd.DataFrame())
+        except (KeyError, TypeError, ValueError) as exc:
+            errors[t] = f"histórico inválido no payload: {exc}"
+            continue
+        if df.empty:
+            errors[t] = f"sem histórico para {p.get('ticker', t)} (fonte: {provider})"
+            continue
+        frames[t] = df
+
+    groups: Dict[Tuple[int, int], List[str]] = {}
+    for t in frames:
+        p = payloads[t]
+        groups.setdefault((int(p.get("window") or len(frames[t])), int(p.get("horizon", 1))), []).append(t)
+    results: Dict[str, Tuple[Optional[Dict[str, Any]], Optional[str]]] = {}
+    t0 = time.perf_counter()
+    for (window, horizon), group in groups.items():
+        try:
+            out = model.predict_frames([frames[t] for t in group], window, horizon, [payloads[t].get("ticker", t) for t in group])
+        except Exception as exc:  # noqa: BLE001 – erro do lote vai para cada ticker dele
+            out = [(None, f"{type(exc).__name__}: {exc}")] * len(group)
+        results.update(zip(group, out))
+    lat = RequestTiming(time.perf_counter() - t0, in_process=True)
+    rows = []
+    for t in tickers:
+        data, err = results.get(t, (None, errors.get(t)))
+        rows.append(_batch_row(t, (data, lat, err)))
+    return pd.DataFrame(rows)
+
+
 # ============================
 # UI
 # ============================
 
+# Fragmentos reexecutam só a própria função quando um widget interno muda (Streamlit >= 1.37);
+# em versões antigas a página inteira reexecuta, como antes.
+fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda func: func)
+
+PREPARED_KEY = "prepared"  # session_state: payload(s) e histórico montados pelo painel de dados
+
+
 def sidebar_ui() -> Dict[str, Any]:
-    st.sidebar.header("Configurações")
-    api_url = st.sidebar.text_input("API Base URL", value=DEFAULT_API_URL, help="Ex.: http://127.0.0.1:8000")
+    """Configurações da barra lateral.
 
-    st.sidebar.markdown("---")
+    O modo de entrada fica fora do formulário (decide quais campos aparecem); o restante só
+    é aplicado ao clicar em "Aplicar", o que dispara uma única reexecução da página.
+    """
+    st.sidebar.header("Configurações")
     input_mode = st.sidebar.radio(
         "Entrada de dados",
-        options=("Ticker (API busca)", "Ticker (app busca via yfinance)", "Upload CSV"),
+        options=("Ticker (API busca)", "Ticker (app busca o histórico)", "Upload CSV", "Watchlist (lote)"),
         index=0,
         help=(
             "Formas de obter o histórico recente: \n"
             "• API busca: o backend coleta os dados do ticker. \n"
-            "• App busca: este app usa yfinance e envia o histórico para a API. \n"
-            "• Upload: você fornece um CSV com colunas Open,High,Low,Close,Volume e Date opcional."
+            "• App busca: este app obtém o histórico (fonte escolhida no formulário) e o envia para a API. \n"
+            "• Upload: você fornece um CSV com colunas Open,High,Low,Close,Volume e Date opcional. \n"
+            "• Watchlist: vários tickers de uma vez; o backend coleta o histórico de cada um."
         ),
     )
 
-    ticker = st.sidebar.text_input("Ticker", value="AMZN")
-    horizon = st.sidebar.select_slider("Horizon (passos à frente)", options=[1, 5], value=5)
-    window = st.sidebar.slider("Window (tamanho da janela)", min_value=30, max_value=180, value=60, step=5)
+    form = st.sidebar.form("config")
+    with form:
+        api_url = st.text_input("API Base URL", value=DEFAULT_API_URL, help="Ex.: http://127.0.0.1:8000")
+        history_provider = st.selectbox(
+            "Fonte do histórico (quando o app busca)",
+            options=list(HISTORY_PROVIDERS),
+            index=list(HISTORY_PROVIDERS).index(HISTORY_PROVIDER) if HISTORY_PROVIDER in HISTORY_PROVIDERS else 0,
+            help=(
+                "yahoo: yfinance (rede). local: arquivos <TICKER>.parquet/.feather/.csv em HISTORY_LOCAL_DIR. "
+                "synthetic: série determinística gerada localmente, para benchmarks sem rede."
+            ),
+        )
 
-    st.sidebar.markdown("---")
-    health_btn = st.sidebar.button("Testar /health")
-    meta_btn = st.sidebar.button("Ver /metadata")
+        ticker = st.text_input("Ticker", value="AMZN")
+        tickers: List[str] = []
+        watchlist_source = "API busca"
+        concurrency = 8
+        use_batch_endpoint = True
+        if input_mode == "Watchlist (lote)":
+            tickers_text = st.text_area(
+                "Tickers (um por linha ou separados por vírgula)", value="AMZN\nAAPL\nMSFT", height=120
+            )
+            tickers = parse_tickers(tickers_text)
+            watchlist_source = st.radio(
+                "Histórico do lote",
+                options=("API busca", "App busca (em lote)"),
+                help="No modo App, o histórico de todos os tickers vem da fonte escolhida, em poucas chamadas agrupadas.",
+            )
+        if input_mode in ("Watchlist (lote)", "Upload CSV"):
+            concurrency = st.slider("Chamadas /predict simultâneas", min_value=1, max_value=64, value=8)
+            use_batch_endpoint = st.checkbox("Usar endpoint de lote (se anunciado no /metadata)", value=True)
+        compact_payload = st.checkbox(
+            "Payload colunar (compacto) se a API suportar",
+            value=True,
+            help="Envia o histórico por coluna quando o /metadata anuncia `history_formats` com `columnar`.",
+        )
+        with st.expander("Gráficos"):
+            chart_points = st.number_input(
+                "Pontos máx. por gráfico", min_value=100, max_value=50_000, value=CHART_MAX_POINTS, step=100
+            )
+            chart_method = st.selectbox(
+                "Decimação",
+                options=("lttb", "minmax"),
+                index=0 if CHART_DECIMATION != "minmax" else 1,
+                help="LTTB preserva a forma visual; min/max preserva picos e vales de cada bucket.",
+            )
+        backend = st.selectbox(
+            "Backend de previsão",
+            options=(BACKEND_HTTP, BACKEND_IN_PROCESS, BACKEND_COMPARE),
+            help=(
+                "HTTP: chama a API. Em processo: carrega MODEL_H1_PATH/MODEL_H5_PATH e SCALER_PATH "
+                "neste processo e prevê sem serializar/HTTP. Comparar: roda os dois e mostra as latências."
+            ),
+        )
+        horizon = st.select_slider("Horizon (passos à frente)", options=[1, 5], value=5)
+        window = st.slider("Window (tamanho da janela)", min_value=30, max_value=180, value=60, step=5)
+        st.form_submit_button("Aplicar", type="primary", use_container_width=True)
 
     return {
         "api_url": api_url,
         "input_mode": input_mode,
+        "history_provider": history_provider,
         "ticker": ticker,
+        "tickers": tickers,
+        "watchlist_source": watchlist_source,
+        "concurrency": concurrency,
+        "use_batch_endpoint": use_batch_endpoint,
+        "compact_payload": compact_payload,
+        "backend": backend,
         "horizon": horizon,
         "window": window,
-        "health_btn": health_btn,
-        "meta_btn": meta_btn,
+        "chart_points": int(chart_points),
+        "chart_method": chart_method,
     }
 
 
 def show_health_and_metadata(api_url: str, do_health: bool, do_meta: bool) -> None:
     cols = st.columns(2)
-    if do_health:
+    health_res: Optional[ApiResult] = None
+    meta_res: Optional[ApiResult] = None
+    if do_health and do_meta:
+        # Colunas independentes: as duas chamadas saem juntas (tempo total ≈ a mais lenta)
+        health_res, meta_res = run_api_calls(
+            lambda c: async_api_health(api_url, client=c),
+            lambda c: async_api_metadata(api_url, client=c),
+        )
+    elif do_health:
+        health_res = api_health(api_url)
+    elif do_meta:
+        meta_res = api_metadata(api_url)
+
+    if health_res is not None:
         with cols[0]:
             st.subheader("/health")
-            data, lat, err = api_health(api_url)
+            data, lat, err = health_res
             if err:
-                st.error(f"Falha no /health ({lat:.3f}s): {err}")
+                st.error(f"Falha no /health ({fmt_latency(lat)}): {err}")
             else:
-                st.success(f"OK ({lat:.3f}s)")
+                st.success(f"OK ({fmt_latency(lat)})")
                 st.json(data)
-    if do_meta:
+    if meta_res is not None:
         with cols[1]:
             st.subheader("/metadata")
-            data, lat, err = api_metadata(api_url)
+            data, lat, err = meta_res
             if err:
-                st.error(f"Falha no /metadata ({lat:.3f}s): {err}")
+                st.error(f"Falha no /metadata ({fmt_latency(lat)}): {err}")
             else:
-                st.info(f"Carregado em {lat:.3f}s")
+                st.info(f"Carregado em {fmt_latency(lat)}")
                 st.json(data)
 
 
-def main() -> None:
-    st.title("📈 Tech Challenge F4 – LSTM Forecast UI")
-    st.caption(
-        "Frontend simples em Streamlit para consumir a API (FastAPI) deste projeto. "
-        "Use como apoio didático para explorar o comportamento do modelo."
-    )
+@fragment
+def health_metadata_panel(api_url: str) -> None:
+    """Ações rápidas /health e /metadata.
 
-    cfg = sidebar_ui()
-    api_url = cfg["api_url"]
+    Os botões reexecutam só este fragmento: nada do pipeline de histórico/payload roda.
+    """
+    b1, b2, b3, _ = st.columns([1, 1, 1, 2])
+    health_btn = b1.button("Testar /health")
+    meta_btn = b2.button("Ver /metadata")
+    # Um botão só é True no rerun que ele disparou: checar os dois juntos precisa de uma ação própria
+    both_btn = b3.button("Checar API + metadata")
+    show_health_and_metadata(api_url, health_btn or both_btn, meta_btn or both_btn)
 
-    # Bloco opcional: ações rápidas /health e /metadata
-    show_health_and_metadata(api_url, cfg["health_btn"], cfg["meta_btn"])
 
-    st.markdown("---")
-    st.header("Previsão")
+@fragment
+def data_panel(cfg: Dict[str, Any]) -> None:
+    """Coleta o histórico e monta o(s) payload(s).
 
-    # Seção de entrada e preparação de payload
+    Reexecuta sozinho quando um widget interno muda (ex.: upload) e publica o resultado em
+    `st.session_state[PREPARED_KEY]`, que é a única entrada do painel de previsão.
+    """
+    api_url = cfg["api_url"]
     payload: Optional[Dict[str, Any]] = None
+    batch_payloads: Optional[Dict[str, Dict[str, Any]]] = None
     history_df: Optional[pd.DataFrame] = None
+    history_format = HISTORY_FORMAT_RECORDS
+    app_builds_history = cfg["input_mode"] in ("Ticker (app busca o histórico)", "Upload CSV") or (
+        cfg["input_mode"] == "Watchlist (lote)" and cfg["watchlist_source"] != "API busca"
+    )
+    if cfg["compact_payload"] and app_builds_history:
+        history_format = negotiate_history_format(cached_api_metadata(api_url))
+    source_name = get_history_provider(cfg["history_provider"]).name
 
     if cfg["input_mode"] == "Ticker (API busca)":
         st.write(
@@ -217,114 +2602,534 @@ def main() -> None:
         )
         payload = {"ticker": cfg["ticker"], "window": int(cfg["window"]), "horizon": int(cfg["horizon"]) }
 
-    elif cfg["input_mode"] == "Ticker (app busca via yfinance)":
+    elif cfg["input_mode"] == "Ticker (app busca o histórico)":
         st.write(
-            "Este app coletará o histórico via yfinance e enviará os últimos `window` pontos para a API."
+            f"Este app coletará o histórico via {source_name} e enviará os últimos `window` pontos para a API."
         )
         with st.spinner("Baixando dados..."):
-            history_df = fetch_history_yf(cfg["ticker"], days_back=max(cfg["window"] * 3, 180))
+            history_df = fetch_history_yf(
+                cfg["ticker"], days_back=max(cfg["window"] * 3, 180), provider=cfg["history_provider"]
+            )
         if history_df is None or history_df.empty:
-            st.warning("Não foi possível obter dados via yfinance. Tente novamente ou altere o ticker.")
+            st.warning(f"Não foi possível obter dados via {source_name}. Tente novamente ou altere o ticker.")
         else:
             st.success(f"Histórico carregado: {len(history_df)} linhas")
-            st.line_chart(history_df["Close"], height=220)
-            payload = build_payload_from_df(history_df, window=cfg["window"], horizon=cfg["horizon"], ticker=cfg["ticker"])
+            st.line_chart(decimate_series(history_df["Close"], cfg["chart_points"], cfg["chart_method"]), height=220)
+            payload = build_payload_from_df(
+                history_df, window=cfg["window"], horizon=cfg["horizon"], ticker=cfg["ticker"], history_format=history_format
+            )
+
+    elif cfg["input_mode"] == "Watchlist (lote)":
+        st.write(
+            "Um payload por ticker da lista. As chamadas saem em paralelo (limitadas pela "
+            "concorrência escolhida) ou em um único POST quando a API anuncia um endpoint de lote."
+        )
+        if not cfg["tickers"]:
+            st.warning("Informe ao menos um ticker na barra lateral.")
+        elif cfg["watchlist_source"] == "API busca":
+            batch_payloads = {
+                t: {"ticker": t, "window": int(cfg["window"]), "horizon": int(cfg["horizon"])}
+                for t in cfg["tickers"]
+            }
+            st.success(f"{len(batch_payloads)} tickers prontos para previsão")
+        else:
+            with st.spinner(f"Baixando histórico de {len(cfg['tickers'])} tickers em lote..."):
+                histories = fetch_history_bulk(
+                    cfg["tickers"], days_back=max(cfg["window"] * 3, 180), provider=cfg["history_provider"]
+                )
+            batch_payloads = {
+                t: build_payload_from_df(
+                    df, window=cfg["window"], horizon=cfg["horizon"], ticker=t, history_format=history_format
+                )
+                for t, df in histories.items()
+                if not df.empty
+            }
+            missing = [t for t, df in histories.items() if df.empty]
+            if missing:
+                st.warning(f"Sem dados em {source_name} para: {', '.join(missing)}")
+            st.success(f"{len(batch_payloads)} tickers prontos para previsão")
 
     else:  # Upload CSV
         st.write(
-            "Faça upload de um CSV com colunas: Open,High,Low,Close,Volume e opcionalmente Date." \
-            " Usaremos os últimos `window` registros."
+            "Faça upload de um CSV (ou Parquet / Feather / Arrow IPC) com colunas: "
+            "Open,High,Low,Close,Volume e opcionalmente Date. Usaremos os últimos `window` registros. "
+            "Vários arquivos (ou um .zip) viram um lote: um ticker por arquivo, nomeado pelo arquivo."
         )
-        up = st.file_uploader("CSV com histórico OHLCV", type=["csv"])
-        if up is not None:
+        uploads = st.file_uploader(
+            "Arquivo(s) com histórico OHLCV", type=list(UPLOAD_SUFFIXES) + ["zip"], accept_multiple_files=True
+        )
+        up = uploads[0] if len(uploads or []) == 1 and not uploads[0].name.lower().endswith(".zip") else None
+        server_files = list_server_uploads()
+        server_file = None
+        if server_files and not uploads:
+            # O upload pelo navegador fica inteiro em memória; estes são lidos do disco em blocos
+            server_file = st.selectbox(
+                f"Ou arquivo já no servidor (`{UPLOAD_SERVER_DIR}`, lido em streaming)",
+                options=[None] + server_files,
+                format_func=lambda name: "—" if name is None else name,
+            )
+        if uploads and up is None:
+            with st.spinner("Lendo arquivos em paralelo..."):
+                frames, errors = parse_uploads(uploads, keep=max(int(cfg["window"]), CHART_TAIL_ROWS))
+            batch_payloads = {
+                t: build_payload_from_df(
+                    df, window=cfg["window"], horizon=cfg["horizon"], ticker=t, history_format=history_format
+                )
+                for t, df in frames.items()
+            }
+            for name, err in errors.items():
+                st.error(f"Falha ao ler {name}: {err}")
+            st.success(f"{len(batch_payloads)} tickers prontos para previsão")
+        if up is not None or server_file is not None:
             try:
-                df = pd.read_csv(up)
-                # Normaliza nomes de colunas esperadas
-                cols_map = {c.lower(): c for c in df.columns}
-                required = ["open", "high", "low", "close", "volume"]
-                if not all(c in cols_map for c in required):
-                    st.error("CSV deve conter colunas: Open, High, Low, Close, Volume")
-                else:
-                    # Ajusta índice de datas se existir
-                    if "date" in cols_map:
-                        df[cols_map["date"]] = pd.to_datetime(df[cols_map["date"]])
-                        df.set_index(cols_map["date"], inplace=True)
-                    df.rename(columns={
-                        cols_map["open"]: "Open",
-                        cols_map["high"]: "High",
-                        cols_map["low"]: "Low",
-                        cols_map["close"]: "Close",
-                        cols_map["volume"]: "Volume",
-                    }, inplace=True)
-                    df = df[["Open", "High", "Low", "Close", "Volume"]].dropna()
-                    history_df = df.sort_index()
-                    st.line_chart(history_df["Close"], height=220)
-                    payload = build_payload_from_df(history_df, window=cfg["window"], horizon=cfg["horizon"], ticker=cfg["ticker"])
+                # Leitura em blocos: só a cauda usada no payload fica em memória; o gráfico
+                # mostra o arquivo inteiro, decimado durante a mesma leitura
+                overview = CloseOverview(cfg["chart_points"], cfg["chart_method"])
+                source = nullcontext(up) if up is not None else open(Path(UPLOAD_SERVER_DIR) / server_file, "rb")
+                with source as fh:
+                    history_df = read_ohlcv_tail(
+                        fh, Path(fh.name).name, keep=max(int(cfg["window"]), CHART_TAIL_ROWS), overview=overview
+                    )
+                st.line_chart(overview.series(), height=220)
+                payload = build_payload_from_df(
+                    history_df,
+                    window=cfg["window"],
+                    horizon=cfg["horizon"],
+                    ticker=cfg["ticker"],
+                    history_format=history_format,
+                )
+            except MissingColumnsError as exc:
+                st.error(str(exc))
             except Exception as exc:  # noqa: BLE001 – mostrar erro amigável
                 st.error(f"Falha ao ler CSV: {exc}")
 
-    # Botão de previsão
-    predict_col, payload_col = st.columns([1, 1])
-    with payload_col:
-        st.subheader("Payload que será enviado")
-        if payload is not None:
-            st.code(json.dumps(payload, indent=2)[:2000], language="json")  # limita tamanho na UI
-        else:
-            st.info("Aguardando dados para montar o payload…")
-
-    with predict_col:
-        st.subheader("Executar previsão")
-        run = st.button("/predict", type="primary", use_container_width=True)
-        if run:
-            if payload is None:
-                st.warning("Necessário montar o payload antes de chamar /predict.")
-            else:
-                with st.spinner("Chamando API /predict…"):
-                    data, lat, err = api_predict(api_url, payload)
-                if err:
-                    st.error(f"Falha no /predict ({lat:.3f}s): {err}")
-                elif not data:
-                    st.warning(f"Resposta vazia do backend ({lat:.3f}s)")
+    # Serializa uma única vez: os mesmos bytes alimentam a prévia e o POST /predict
+    payload_body = encode_payload(payload) if payload is not None else None
+
+    st.session_state[PREPARED_KEY] = {
+        "payload": payload,
+        "payload_body": payload_body,
+        "batch_payloads": batch_payloads,
+        "history_df": history_df,
+    }
+
+    st.subheader("Payload que será enviado")
+    if payload is not None:
+        st.caption(f"{len(payload_body or b'')} bytes")
+        st.code(preview_payload(payload), language="json")  # limita tamanho na UI
+    elif batch_payloads:
+        first = next(iter(batch_payloads.values()))
+        st.caption(f"Lote com {len(batch_payloads)} payloads; exibindo o primeiro.")
+        st.code(preview_payload(first), language="json")
+    else:
+        st.info("Aguardando dados para montar o payload…")
+
+
+@fragment
+def prediction_panel(cfg: Dict[str, Any]) -> None:
+    """Botão /predict e resultados.
+
+    Lê o que o painel de dados publicou em `st.session_state[PREPARED_KEY]`; o clique
+    reexecuta só este fragmento, sem baixar o histórico nem remontar o payload.
+    """
+    api_url = cfg["api_url"]
+    prepared = st.session_state.get(PREPARED_KEY) or {}
+    payload = prepared.get("payload")
+    payload_body = prepared.get("payload_body")
+    batch_payloads = prepared.get("batch_payloads")
+    history_df = prepared.get("history_df")
+
+    st.subheader("Executar previsão")
+    run = st.button("/predict", type="primary", use_container_width=True)
+    use_http = cfg["backend"] != BACKEND_IN_PROCESS
+    use_local = cfg["backend"] != BACKEND_HTTP
+    if run and batch_payloads:
+        timings: Dict[str, float] = {}
+        if use_http:
+            batch_endpoint = None
+            if cfg["use_batch_endpoint"]:
+                batch_endpoint = detect_batch_endpoint(cached_api_metadata(api_url))
+            how = f"POST único em {batch_endpoint}" if batch_endpoint else f"até {cfg['concurrency']} chamadas simultâneas"
+            start = time.perf_counter()
+            with st.spinner(f"Prevendo {len(batch_payloads)} tickers ({how})…"):
+                results_df = predict_watchlist(
+                    api_url, batch_payloads, concurrency=cfg["concurrency"], batch_endpoint=batch_endpoint
+                )
+            timings[f"{BACKEND_HTTP} ({how})"] = time.perf_counter() - start
+        if use_local:
+            start = time.perf_counter()
+            with st.spinner(f"Prevendo {len(batch_payloads)} tickers em processo…"):
+                local_df = predict_watchlist_in_process(batch_payloads, provider=cfg["history_provider"])
+            timings[BACKEND_IN_PROCESS] = time.perf_counter() - start
+            if not use_http:
+                results_df = local_df
+        for col, (label, elapsed) in zip(st.columns(len(timings)), timings.items()):
+            col.metric(label, f"{elapsed:.3f}s")
+        n_err = int(results_df["error"].notna().sum())
+        msg = f"{len(results_df)} tickers; {n_err} com erro"
+        (st.warning if n_err else st.success)(msg)
+        st.dataframe(results_df, use_container_width=True)
+        if use_http and use_local:
+            n_local_err = int(local_df["error"].notna().sum())
+            with st.expander(f"Resultado em processo ({n_local_err} com erro)"):
+                st.dataframe(local_df, use_container_width=True)
+    elif run:
+        if payload is None:
+            st.warning("Necessário montar o payload antes de chamar /predict.")
+            return
+        results: Dict[str, ApiResult] = {}
+        with st.spinner("Executando previsão…"):
+            if use_http:
+                # Na comparação a chamada HTTP é real (sem o cache de previsões)
+                predict_http = api_predict_with_fallback if use_local else cached_api_predict
+                results[BACKEND_HTTP] = predict_http(api_url, payload, payload_body)
+            if use_local:
+                results[BACKEND_IN_PROCESS] = in_process_predict(payload, provider=cfg["history_provider"])
+
+        cols = st.columns(len(results))
+        for col, (label, (res_data, res_lat, res_err)) in zip(cols, results.items()):
+            with col:
+                if len(results) > 1:
+                    st.metric(label, f"{float(res_lat) * 1e3:.1f} ms")
+                if res_err:
+                    st.error(f"Falha – {label} ({fmt_latency(res_lat)}): {res_err}")
+                elif not res_data:
+                    st.warning(f"Resposta vazia – {label} ({fmt_latency(res_lat)})")
                 else:
-                    st.success(f"Previsão recebida em {lat:.3f}s")
-                    st.json(data)
-
-                    # Exibição amigável: tentamos detectar um formato comum
-                    # Esperado (sugestão de schemas no backend):
-                    # {
-                    #   "predictions": [float, float, ...],
-                    #   "horizon": 5,
-                    #   "last_date": "YYYY-MM-DD"  # opcional
-                    # }
-                    preds = data.get("predictions") if isinstance(data, dict) else None
-                    if isinstance(preds, list) and preds:
-                        last_date_str = data.get("last_date")
-                        if last_date_str is None and history_df is not None and not history_df.empty:
-                            last_date_str = history_df.index.max().strftime("%Y-%m-%d")
-                        # Cria índice de datas futuras (útil para visualização)
-                        try:
-                            base_date = pd.to_datetime(last_date_str) if last_date_str else pd.Timestamp.today()
-                        except Exception:
-                            base_date = pd.Timestamp.today()
-                        future_idx = pd.date_range(base_date + pd.Timedelta(days=1), periods=len(preds), freq="D")
-                        df_pred = pd.DataFrame({"PredictedClose": preds}, index=future_idx)
-
-                        st.subheader("Tabela de Previsões")
-                        st.dataframe(df_pred, use_container_width=True)
-
-                        if history_df is not None and not history_df.empty:
-                            st.subheader("Histórico (Close) + Previsões")
-                            # Concatenamos para um chart único
-                            plot_df = pd.concat([history_df[["Close"]].rename(columns={"Close": "Close"}).tail(200), df_pred.rename(columns={"PredictedClose": "Close"})])
-                            st.line_chart(plot_df["Close"], height=300)
+                    st.success(f"Previsão ({label}) em {fmt_latency(res_lat)}")
+        ok = [r[0] for r in results.values() if r[2] is None and r[0]]
+        if len(ok) == 2:
+            a, b = (d.get("predictions") if isinstance(d, dict) else None for d in ok)
+            if isinstance(a, list) and isinstance(b, list) and a and len(a) == len(b):
+                diff = float(np.max(np.abs(np.subtract(a, b))))
+                st.caption(f"Maior diferença entre as previsões HTTP e em processo: {diff:.6g}")
+        if not ok:
+            return
+        data = ok[0]
+        st.json(data)
+
+        # Exibição amigável: tentamos detectar um formato comum
+        # Esperado (sugestão de schemas no backend):
+        # {
+        #   "predictions": [float, float, ...],
+        #   "horizon": 5,
+        #   "last_date": "YYYY-MM-DD"  # opcional
+        # }
+        preds = data.get("predictions") if isinstance(data, dict) else None
+        if isinstance(preds, list) and preds:
+            last_date_str = data.get("last_date")
+            if last_date_str is None and history_df is not None and not history_df.empty:
+                last_date_str = history_df.index.max().strftime("%Y-%m-%d")
+            # Cria índice de datas futuras (útil para visualização)
+            try:
+                base_date = pd.to_datetime(last_date_str) if last_date_str else pd.Timestamp.today()
+            except Exception:
+                base_date = pd.Timestamp.today()
+            future_idx = pd.date_range(base_date + pd.Timedelta(days=1), periods=len(preds), freq="D")
+            df_pred = pd.DataFrame({"PredictedClose": preds}, index=future_idx)
 
+            st.subheader("Tabela de Previsões")
+            st.dataframe(df_pred, use_container_width=True)
 
-if __name__ == "__main__":
-    # Permite executar como script padrão (sem streamlit) para checar disponibilidade da API
-    # Ex.: python app.py
-    api_url = DEFAULT_API_URL
+            if history_df is not None and not history_df.empty:
+                st.subheader("Histórico (Close) + Previsões")
+                # Concatenamos para um chart único
+                # Só o histórico é decimado; os pontos previstos vão sempre inteiros
+                hist_close = decimate_series(
+                    history_df["Close"].tail(CHART_TAIL_ROWS), cfg["chart_points"], cfg["chart_method"]
+                )
+                plot_df = pd.concat([hist_close.to_frame("Close"), df_pred.rename(columns={"PredictedClose": "Close"})])
+                st.line_chart(plot_df["Close"], height=300)
+
+
+@fragment
+def latency_panel() -> None:
+    """Percentis de latência vistos pelo cliente (todas as sessões deste processo).
+
+    Chamado dentro de `with st.sidebar`; trocar a janela ou atualizar reexecuta só o painel.
+    """
+    with st.expander("Latência da API (cliente)"):
+        label = st.selectbox("Janela", options=list(LATENCY_WINDOWS), key="latency_window")
+        st.button("Atualizar", key="latency_refresh")
+        summary = latency_recorder().summary(LATENCY_WINDOWS[label])
+        if summary.empty:
+            st.caption("Nenhuma chamada registrada nesta janela.")
+        else:
+            st.dataframe(summary, hide_index=True, use_container_width=True)
+
+
+def main() -> None:
+    st.title("📈 Tech Challenge F4 – LSTM Forecast UI")
+    st.caption(
+        "Frontend simples em Streamlit para consumir a API (FastAPI) deste projeto. "
+        "Use como apoio didático para explorar o comportamento do modelo."
+    )
+
+    # Dependências entre as partes da página:
+    #   formulário da barra lateral ("Aplicar") -> reexecução completa
+    #   health_metadata_panel <- cfg["api_url"]               (reexecuta sozinho)
+    #   data_panel            <- cfg                          (reexecuta sozinho; publica PREPARED_KEY)
+    #   prediction_panel      <- cfg + session_state[PREPARED_KEY]  (reexecuta sozinho)
+    #   latency_panel         <- latency_recorder() do processo  (reexecuta sozinho)
+    cfg = sidebar_ui()
+    with st.sidebar:
+        latency_panel()
+
+    health_metadata_panel(cfg["api_url"])
+
+    st.markdown("---")
+    st.header("Previsão")
+    data_panel(cfg)
+    prediction_panel(cfg)
+
+
+# ============================
+# Gerador de carga (python app.py)
+# ============================
+def classify_error(err: str) -> str:
+    """Agrupa a mensagem de erro do `_request` em categorias para o relatório."""
+    status = re.match(r"(\d{3}) ", err)
+    if status:
+        return f"http_{status.group(1)}"
+    lowered = err.lower()
+    if "timed out" in lowered or "timeout" in lowered:
+        return "timeout"
+    if "connection" in lowered or "max retries" in lowered:
+        return "connection"
+    return "other"
+
+
+def build_load_bodies(
+    tickers: List[str], window: int, horizon: int, provider: str, history_format: str
+) -> List[bytes]:
+    """Um corpo de `/predict` serializado por ticker, montado com `build_payload_from_df`."""
+    bodies = []
+    for ticker in tickers:
+        df = fetch_history_yf(ticker, days_back=max(window * 3, 180), provider=provider)
+        if df is None or len(df) < window:
+            print(f"[load] sem histórico suficiente para {ticker}; ignorado", file=sys.stderr)
+            continue
+        payload = build_payload_from_df(df, window=window, horizon=horizon, ticker=ticker, history_format=history_format)
+        bodies.append(encode_payload(payload))
+    return bodies
+
+
+def run_load(
+    url: str,
+    bodies: List[bytes],
+    *,
+    mode: str = "closed",
+    concurrency: int = 8,
+    rate: float = 10.0,
+    warmup: float = 5.0,
+    duration: float = 30.0,
+    timeout: int = 15,
+) -> List[Tuple[float, RequestTiming, Optional[str]]]:
+    """Dispara POSTs em `url` e devolve (início relativo, tempos, erro) de cada chamada medida.
+
+    - closed: `concurrency` requisições sempre em voo (cada worker manda a próxima ao
+      receber a resposta);
+    - open: chegadas a `rate` req/s em horários fixos, independentes das respostas, com até
+      `concurrency` em voo. A latência conta a partir do horário agendado, então a fila
+      formada quando o servidor não acompanha aparece nos percentis (sem "coordinated omission").
+    Chamadas iniciadas durante o `warmup` são descartadas.
+    """
+    # Pool próprio do tamanho da concorrência e sem retries: cada tentativa conta como uma amostra
+    session = make_http_session(pool_maxsize=max(concurrency, 1), max_retries=0)
+    samples: List[Tuple[float, RequestTiming, Optional[str]]] = []
+    lock = threading.Lock()
+    t0 = time.perf_counter()
+    measure_from = t0 + warmup
+    deadline = measure_from + duration
+
+    def send(i: int, scheduled: float) -> None:
+        _, timing, err = _request("POST", url, body=bodies[i % len(bodies)], timeout=timeout, session=session)
+        if scheduled < measure_from:
+            return
+        total = time.perf_counter() - scheduled  # inclui espera na fila (open-loop)
+        fields = timing.as_dict()
+        total = max(total, fields.pop("total"))
+        with lock:
+            samples.append((scheduled - measure_from, RequestTiming(total, **fields), err))
+
+    if mode == "closed":
+        counter = iter(range(1 << 62))
+
+        def worker() -> None:
+            while True:
+                now = time.perf_counter()
+                if now >= deadline:
+                    return
+                with lock:
+                    i = next(counter)
+                send(i, now)
+
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+        for th in threads:
+            th.start()
+        for th in threads:
+            th.join()
+    else:
+        interval = 1.0 / rate
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            i = 0
+            while True:
+                scheduled = t0 + i * interval
+                if scheduled >= deadline:
+                    break
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(send, i, scheduled)
+                i += 1
+    session.close()
+    return samples
+
+
+def summarize_load(samples: List[Tuple[float, RequestTiming, Optional[str]]], duration: float) -> Dict[str, Any]:
+    """Vazão, percentis (p50/p95/p99/p999) em ms, fases medianas e erros por categoria."""
+    errors: Dict[str, int] = {}
+    for _, _, err in samples:
+        if err:
+            kind = classify_error(err)
+            errors[kind] = errors.get(kind, 0) + 1
+    n = len(samples)
+    n_err = sum(errors.values())
+    report: Dict[str, Any] = {
+        "requests": n,
+        "ok": n - n_err,
+        "errors": n_err,
+        "error_rate": round(n_err / n, 4) if n else 0.0,
+        "throughput_rps": round(n / duration, 2) if duration else 0.0,
+        "ok_rps": round((n - n_err) / duration, 2) if duration else 0.0,
+        "error_breakdown": dict(sorted(errors.items())),
+    }
+    totals = np.array([float(t) for _, t, _ in samples])
+    quantiles = {"p50": 50, "p95": 95, "p99": 99, "p999": 99.9}
+    report["latency_ms"] = {
+        name: round(float(np.percentile(totals, q)) * 1e3, 3) if n else None for name, q in quantiles.items()
+    }
+    report["latency_ms"].update(
+        mean=round(float(totals.mean()) * 1e3, 3) if n else None,
+        max=round(float(totals.max()) * 1e3, 3) if n else None,
+    )
+    report["phase_p50_ms"] = {
+        name: round(float(np.median([getattr(t, name) for _, t, _ in samples])) * 1e3, 3) if n else None
+        for name in RequestTiming.PHASES
+    }
+    report["bytes_out_mean"] = round(float(np.mean([t.bytes_out for _, t, _ in samples])), 1) if n else None
+    report["bytes_in_mean"] = round(float(np.mean([t.bytes_in for _, t, _ in samples])), 1) if n else None
+    return report
+
+
+def _flatten(d: Dict[str, Any], prefix: str = "") -> Dict[str, Any]:
+    flat: Dict[str, Any] = {}
+    for key, value in d.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{name}."))
+        else:
+            flat[name] = value
+    return flat
+
+
+def write_load_report(report: Dict[str, Any], path: str) -> None:
+    """JSON (aninhado, `sort_keys`) ou CSV (uma linha achatada) conforme a extensão de `path`."""
+    if path.lower().endswith(".csv"):
+        pd.DataFrame([_flatten(report)]).to_csv(path, index=False)
+    else:
+        Path(path).write_bytes(orjson.dumps(report, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS) + b"\n")
+
+
+def _positive(kind: Callable[[str], Any], allow_zero: bool = False) -> Callable[[str], Any]:
+    """`type=` do argparse que rejeita valores negativos (e zero, salvo `allow_zero`)."""
+
+    def parse(text: str) -> Any:
+        value = kind(text)
+        if value < 0 or (value == 0 and not allow_zero):
+            raise argparse.ArgumentTypeError(f"precisa ser {'>= 0' if allow_zero else '> 0'}: {text}")
+        return value
+
+    parse.__name__ = kind.__name__  # mensagem de erro do argparse: "invalid int value"
+    return parse
+
+
+def load_cli(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python app.py",
+        description="Teste de carga headless do /predict com payloads montados por build_payload_from_df.",
+    )
+    parser.add_argument("--api-url", default=DEFAULT_API_URL)
+    parser.add_argument("--health-only", action="store_true", help="só checa o /health (comportamento antigo)")
+    parser.add_argument("--mode", choices=("closed", "open"), default="closed",
+                        help="closed: N requisições em voo; open: taxa fixa de chegadas")
+    parser.add_argument("--concurrency", type=_positive(int), default=8, help="em voo (closed) ou máximo em voo (open)")
+    parser.add_argument("--rate", type=_positive(float), default=10.0, help="req/s no modo open")
+    parser.add_argument("--warmup", type=_positive(float, allow_zero=True), default=5.0, help="segundos descartados no início")
+    parser.add_argument("--duration", type=_positive(float), default=30.0, help="segundos medidos após o warmup")
+    parser.add_argument("--timeout", type=_positive(int), default=15)
+    parser.add_argument("--tickers", default="AMZN", help="lista separada por vírgula; payloads em rodízio")
+    parser.add_argument("--window", type=_positive(int), default=60)
+    parser.add_argument("--horizon", type=_positive(int), default=5)
+    parser.add_argument("--provider", choices=list(HISTORY_PROVIDERS), default=HISTORY_PROVIDER)
+    parser.add_argument("--history-format", choices=(HISTORY_FORMAT_RECORDS, HISTORY_FORMAT_COLUMNAR),
+                        default=HISTORY_FORMAT_RECORDS)
+    parser.add_argument("--report", help="arquivo de saída (.json ou .csv)")
+    args = parser.parse_args(argv)
+
+    api_url = args.api_url
     health, lat, err = api_health(api_url)
     if err:
-        print(f"[app.py] /health erro ({lat:.3f}s): {err}")
+        print(f"[app.py] /health erro ({fmt_latency(lat)}): {err}")
+        return 1
+    print(f"[app.py] /health ok ({fmt_latency(lat)}): {health}")
+    if args.health_only:
+        return 0
+
+    bodies = build_load_bodies(
+        parse_tickers(args.tickers), args.window, args.horizon, args.provider, args.history_format
+    )
+    if not bodies:
+        print("[load] nenhum payload montado", file=sys.stderr)
+        return 1
+    how = f"{args.concurrency} em voo" if args.mode == "closed" else f"{args.rate:g} req/s (até {args.concurrency} em voo)"
+    print(f"[load] {args.mode}-loop, {how}; warmup {args.warmup:g}s + {args.duration:g}s")
+    samples = run_load(
+        f"{api_url.rstrip('/')}/predict",
+        bodies,
+        mode=args.mode,
+        concurrency=args.concurrency,
+        rate=args.rate,
+        warmup=args.warmup,
+        duration=args.duration,
+        timeout=args.timeout,
+    )
+    report = summarize_load(samples, args.duration)
+    report["config"] = {k: v for k, v in vars(args).items() if k not in ("report", "health_only")}
+    report["started_at"] = datetime.now().isoformat(timespec="seconds")
+
+    lat_ms = report["latency_ms"]
+    print(
+        f"[load] {report['requests']} requisições, {report['throughput_rps']} req/s, "
+        f"erros {report['errors']} ({report['error_rate']:.2%})"
+    )
+    if report["requests"]:
+        print("[load] latência (ms): " + ", ".join(f"{k} {v}" for k, v in lat_ms.items()))
+        print("[load] fases p50 (ms): " + ", ".join(f"{k} {v}" for k, v in report["phase_p50_ms"].items()))
+    for kind, count in report["error_breakdown"].items():
+        print(f"[load]   {kind}: {count}")
+    if args.report:
+        write_load_report(report, args.report)
+        print(f"[load] relatório em {args.report}")
+    return 1 if report["requests"] == 0 else 0
+
+
+if __name__ == "__main__":
+    from streamlit import runtime
+
+    if runtime.exists():
+        # `streamlit run app.py` também executa este módulo como __main__
+        main()
     else:
-        print(f"[app.py] /health ok ({lat:.3f}s): {health}")
\ No newline at end of file
+        # Ex.: python app.py --mode open --rate 50 --duration 60 --report carga.json
+        sys.exit(load_cli())
@@ -0,0 +1,114 @@
+"""
+Benchmark do motor de inferência NumPy (`NumpyLSTMModel`, app.py) contra o Keras/TensorFlow.
+
+Mede, para um modelo `.h5` salvo pelo treino:
+- partida: tempo e RSS extras para ter o modelo pronto (em subprocesso limpo, depois do
+  `import app`, que é comum aos dois caminhos): `from_h5` (.npz) × `import tensorflow` +
+  `load_model`;
+- latência do forward por tamanho de lote (janelas aleatórias na escala do scaler);
+- maior diferença absoluta entre as saídas dos dois motores.
+
+Sem TensorFlow instalado, roda só o lado NumPy.
+
+Execução:
+    python scripts/bench_inference.py --h5 models/model_h5.h5
+    python scripts/bench_inference.py --h5 models/model_h1.h5 --batches 1 32 500 --repeat 20
+"""
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import os
+import subprocess
+import sys
+import timeit
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+from app import NumpyLSTMModel  # noqa: E402
+
+_STARTUP = """
+import resource, sys, time
+sys.path.insert(0, {root!r})
+import app
+rss0 = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+t0 = time.perf_counter()
+{load}
+dt = time.perf_counter() - t0
+rss1 = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(dt, (rss1 - rss0) / 1024)
+"""
+
+_LOADERS = {
+    "numpy": "app.NumpyLSTMModel.from_h5({h5!r})",
+    "keras": "from tensorflow import keras\nkeras.models.load_model({h5!r}, compile=False)",
+}
+
+
+def measure_startup(engine: str, h5: str) -> Optional[Dict[str, float]]:
+    """Tempo (s) e RSS extra (MB) para carregar o modelo em um processo novo."""
+    code = _STARTUP.format(root=ROOT, load=_LOADERS[engine].format(h5=h5))
+    proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    if proc.returncode != 0:
+        print(f"[{engine}] falhou:\n{proc.stderr.strip().splitlines()[-1]}", file=sys.stderr)
+        return None
+    seconds, rss_mb = proc.stdout.split()[-2:]
+    return {"seconds": float(seconds), "rss_mb": float(rss_mb)}
+
+
+def input_shape(model: NumpyLSTMModel, window: int) -> tuple:
+    first = next(layer for layer in model.layers if layer["class"] == "LSTM")
+    n_features = model.weights[f"{first['name']}/0"].shape[0]
+    return window, n_features
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--h5", default=os.getenv("MODEL_H5_PATH", "./models/model_h5.h5"))
+    parser.add_argument("--window", type=int, default=int(os.getenv("WINDOW", "60")))
+    parser.add_argument("--batches", type=int, nargs="+", default=[1, 32, 500])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--skip-startup", action="store_true")
+    args = parser.parse_args()
+
+    has_tf = importlib.util.find_spec("tensorflow") is not None
+    engines = ["numpy"] + (["keras"] if has_tf else [])
+    if not has_tf:
+        print("TensorFlow não instalado: medindo apenas o motor NumPy.")
+
+    if not args.skip_startup:
+        print(f"{'motor':>8} {'partida (s)':>12} {'RSS extra (MB)':>15}")
+        for engine in engines:
+            res = measure_startup(engine, args.h5)
+            if res:
+                print(f"{engine:>8} {res['seconds']:>12.3f} {res['rss_mb']:>15.1f}")
+
+    np_model = NumpyLSTMModel.from_h5(args.h5)
+    runners: Dict[str, Callable[[np.ndarray], Any]] = {"numpy": np_model}
+    if has_tf:
+        from tensorflow import keras
+
+        tf_model = keras.models.load_model(args.h5, compile=False)
+        runners["keras"] = lambda x: np.asarray(tf_model(x, training=False))
+
+    window, n_features = input_shape(np_model, args.window)
+    rng = np.random.default_rng(42)
+    header = "".join(f" {e + ' (ms)':>13}" for e in runners)
+    print(f"\n{'lote':>6}{header} {'máx |Δ|':>10}")
+    for batch in args.batches:
+        x = rng.normal(0, 1, (batch, window, n_features)).astype(np.float32)
+        outputs = {name: np.asarray(run(x)) for name, run in runners.items()}  # aquece e guarda a saída
+        times = {
+            name: min(timeit.repeat(lambda: run(x), number=1, repeat=args.repeat)) * 1e3
+            for name, run in runners.items()
+        }
+        diff = float(np.abs(outputs["numpy"] - outputs["keras"]).max()) if "keras" in outputs else float("nan")
+        cols = "".join(f" {times[name]:>13.3f}" for name in runners)
+        print(f"{batch:>6}{cols} {diff:>10.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Micro-benchmark de `build_payload_from_df` (app.py).
+
+Compara a implementação original (`iterrows` + `float()` por célula) com o caminho
+vetorizado atual e confere que o JSON gerado é idêntico byte a byte.
+
+Execução:
+    python scripts/bench_payload.py
+    python scripts/bench_payload.py --windows 60 180 1000 10000 --repeat 5
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import timeit
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from app import build_payload_from_df  # noqa: E402
+
+
+def build_payload_iterrows(df: pd.DataFrame, window: int, horizon: int, ticker: Optional[str] = None) -> Dict[str, Any]:
+    """Implementação de referência (versão anterior, com `iterrows`)."""
+    tail = df.tail(window)
+    records = [
+        {
+            "date": idx.strftime("%Y-%m-%d"),
+            "open": float(row["Open"]),
+            "high": float(row["High"]),
+            "low": float(row["Low"]),
+            "close": float(row["Close"]),
+            "volume": float(row["Volume"]),
+        }
+        for idx, row in tail.iterrows()
+    ]
+    payload: Dict[str, Any] = {"horizon": int(horizon), "window": int(window), "history": records}
+    if ticker:
+        payload["ticker"] = ticker
+    return payload
+
+
+def synthetic_ohlcv(n: int, seed: int = 42) -> pd.DataFrame:
+    """OHLCV sintético com os mesmos dtypes do yfinance (preços float64, volume int64)."""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    open_ = close * (1 + rng.normal(0, 0.002, n))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.003, n)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.003, n)))
+    volume = rng.integers(1_000_000, 50_000_000, n)
+    idx = pd.bdate_range(end="2024-12-31", periods=n, name="Date")
+    return pd.DataFrame({"Open": open_, "High": high, "Low": low, "Close": close, "Volume": volume}, index=idx)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--windows", type=int, nargs="+", default=[60, 180, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    df = synthetic_ohlcv(max(args.windows))
+    print(f"{'window':>8} {'iterrows (ms)':>14} {'vetorizado (ms)':>16} {'ganho':>7}")
+    for window in args.windows:
+        old = json.dumps(build_payload_iterrows(df, window, 5, "AMZN"))
+        new = json.dumps(build_payload_from_df(df, window, 5, "AMZN"))
+        if old != new:
+            raise SystemExit(f"JSON divergente para window={window}")
+
+        number = max(1, 2000 // window)
+        t_old = min(timeit.repeat(lambda: build_payload_iterrows(df, window, 5, "AMZN"), number=number, repeat=args.repeat)) / number
+        t_new = min(timeit.repeat(lambda: build_payload_from_df(df, window, 5, "AMZN"), number=number, repeat=args.repeat)) / number
+        print(f"{window:>8} {t_old * 1e3:>14.3f} {t_new * 1e3:>16.3f} {t_old / t_new:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+API de previsão "dublê" para benchmarks locais do app (sem rede e sem modelos).
+
+Implementa `/health`, `/metadata`, `/predict` e `/predict/batch` com o mesmo contrato
+documentado em `build_payload_from_df` (app.py): histórico em registros ou colunar,
+resposta com `predictions`, `horizon` e `last_date`. As previsões são determinísticas
+(derivadas do último `close` ou do ticker), então o cache do cliente pode ser medido.
+
+Latência, erros e tamanho da resposta são configuráveis:
+    --latency        distribuição do tempo de resposta do /predict (por chamada)
+    --meta-latency   idem para /health e /metadata
+    --error-rate     fração de chamadas do /predict que falham com --error-status
+    --pad-bytes      bytes extras no corpo de cada previsão (respostas maiores)
+
+Distribuições (segundos): `const:0.05`, `uniform:0.01,0.2`, `exp:0.05` (média),
+`lognormal:0.05,0.6` (mediana, sigma) ou `pareto:0.02,2.5` (mínimo, alfa – cauda longa).
+
+Execução:
+    python scripts/stub_api.py --port 8001 --latency lognormal:0.08,0.5 --error-rate 0.01
+    API_BASE_URL=http://127.0.0.1:8001 streamlit run app.py
+    python app.py --api-url http://127.0.0.1:8001 --mode open --rate 100 --provider synthetic
+
+`GET /stats` devolve quantas chamadas cada endpoint atendeu (útil para conferir cache e
+coalescência no cliente); `POST /stats/reset` zera os contadores.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import math
+import os
+import random
+import zlib
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import orjson
+import uvicorn
+from fastapi import FastAPI, Request, Response
+
+
+def parse_distribution(spec: str) -> Callable[[random.Random], float]:
+    """Converte `nome:p1[,p2]` em um amostrador de segundos (sempre ≥ 0)."""
+    name, _, args = spec.partition(":")
+    params = [float(p) for p in args.split(",") if p.strip()] if args else []
+    if name == "const":
+        (value,) = params or [0.0]
+        return lambda rng: value
+    if name == "uniform":
+        low, high = params
+        return lambda rng: rng.uniform(low, high)
+    if name == "exp":
+        (mean,) = params
+        return lambda rng: rng.expovariate(1.0 / mean) if mean > 0 else 0.0
+    if name == "lognormal":
+        median, sigma = params
+        return lambda rng: rng.lognormvariate(math.log(median), sigma)
+    if name == "pareto":
+        minimum, alpha = params
+        return lambda rng: minimum * rng.paretovariate(alpha)
+    raise ValueError(f"distribuição desconhecida: {spec!r} (use const/uniform/exp/lognormal/pareto)")
+
+
+@dataclass
+class StubConfig:
+    latency: str = "const:0"
+    meta_latency: str = "const:0"
+    error_rate: float = 0.0
+    error_status: Tuple[int, ...] = (500, 503)
+    pad_bytes: int = 0
+    model_version: str = "stub-1"
+    batch: bool = True
+    columnar: bool = True
+    seed: Optional[int] = None
+    stats: Counter = field(default_factory=Counter)
+
+
+def _error(status: int, detail: str) -> Response:
+    return Response(orjson.dumps({"detail": detail}), status_code=status, media_type="application/json")
+
+
+def _last_close_and_date(payload: Dict[str, Any]) -> Tuple[Optional[float], Optional[str], int]:
+    """(último close, última data, nº de linhas) do histórico em qualquer formato."""
+    history = payload.get("history")
+    if isinstance(history, dict):
+        closes, dates = history.get("close") or [], history.get("date") or []
+        if len(closes) != len(dates):
+            raise ValueError("colunas do histórico com tamanhos diferentes")
+        return (float(closes[-1]) if closes else None), (dates[-1] if dates else None), len(closes)
+    if isinstance(history, list):
+        if not history:
+            return None, None, 0
+        last = history[-1]
+        return float(last["close"]), last.get("date"), len(history)
+    if history is None:
+        return None, None, 0
+    raise ValueError("`history` deve ser lista de registros ou dict de colunas")
+
+
+def fake_prediction(payload: Dict[str, Any], pad_bytes: int = 0) -> Dict[str, Any]:
+    """Previsão determinística no formato da API real (`predictions`, `horizon`, `last_date`)."""
+    horizon = int(payload.get("horizon", 1))
+    if horizon < 1:
+        raise ValueError("`horizon` deve ser ≥ 1")
+    ticker = str(payload.get("ticker") or "")
+    last_close, last_date, _ = _last_close_and_date(payload)
+    if last_close is None:
+        # Modo "API busca": sem histórico no payload, parte de um preço derivado do ticker
+        last_close = 50.0 + zlib.crc32(ticker.encode()) % 450
+        last_date = (date.today() - timedelta(days=1)).isoformat()
+    drift = ((zlib.crc32(f"{ticker}|{last_date}".encode()) % 200) - 100) / 1e4  # ±1% ao dia
+    preds = [round(last_close * (1 + drift) ** step, 4) for step in range(1, horizon + 1)]
+    result: Dict[str, Any] = {"ticker": ticker or None, "horizon": horizon, "predictions": preds, "last_date": last_date}
+    if pad_bytes > 0:
+        result["padding"] = "x" * pad_bytes
+    return result
+
+
+def create_app(config: StubConfig) -> FastAPI:
+    app = FastAPI(title="Stub LSTM Forecast API", version=config.model_version)
+    rng = random.Random(config.seed)
+    predict_latency = parse_distribution(config.latency)
+    meta_latency = parse_distribution(config.meta_latency)
+
+    async def delay(sampler: Callable[[random.Random], float]) -> None:
+        seconds = max(sampler(rng), 0.0)
+        if seconds:
+            await asyncio.sleep(seconds)
+
+    def injected_error() -> Optional[Response]:
+        if config.error_rate > 0 and rng.random() < config.error_rate:
+            status = rng.choice(config.error_status)
+            config.stats[f"error_{status}"] += 1
+            return _error(status, "erro injetado pelo stub")
+        return None
+
+    async def read_json(request: Request) -> Any:
+        return orjson.loads(await request.body())
+
+    @app.get("/health")
+    async def health() -> Response:
+        config.stats["/health"] += 1
+        await delay(meta_latency)
+        return Response(orjson.dumps({"status": "ok"}), media_type="application/json")
+
+    @app.get("/metadata")
+    async def metadata() -> Response:
+        config.stats["/metadata"] += 1
+        await delay(meta_latency)
+        endpoints = ["/health", "/metadata", "/predict"] + (["/predict/batch"] if config.batch else [])
+        body: Dict[str, Any] = {
+            "model_version": config.model_version,
+            "endpoints": endpoints,
+            "history_formats": ["records", "columnar"] if config.columnar else ["records"],
+            "horizons": [1, 5],
+            "stub": True,
+        }
+        if config.batch:
+            body["batch_endpoint"] = "/predict/batch"
+        return Response(orjson.dumps(body), media_type="application/json")
+
+    @app.post("/predict")
+    async def predict(request: Request) -> Response:
+        config.stats["/predict"] += 1
+        await delay(predict_latency)
+        error = injected_error()
+        if error is not None:
+            return error
+        try:
+            payload = await read_json(request)
+            if payload.get("history_format") == "columnar" and not config.columnar:
+                return _error(422, "formato colunar desativado neste stub")
+            result = fake_prediction(payload, config.pad_bytes)
+        except (ValueError, KeyError, TypeError, AttributeError, orjson.JSONDecodeError) as exc:
+            return _error(422, f"payload inválido: {exc}")
+        return Response(orjson.dumps(result), media_type="application/json")
+
+    if config.batch:
+
+        @app.post("/predict/batch")
+        async def predict_batch(request: Request) -> Response:
+            config.stats["/predict/batch"] += 1
+            await delay(predict_latency)
+            error = injected_error()
+            if error is not None:
+                return error
+            try:
+                payloads = await read_json(request)
+            except orjson.JSONDecodeError as exc:
+                return _error(422, f"payload inválido: {exc}")
+            if not isinstance(payloads, list):
+                return _error(422, "esperado um array de payloads")
+            results: List[Dict[str, Any]] = []
+            for payload in payloads:
+                try:
+                    results.append(fake_prediction(payload, config.pad_bytes))
+                except (ValueError, KeyError, TypeError, AttributeError) as exc:
+                    results.append({"ticker": payload.get("ticker") if isinstance(payload, dict) else None,
+                                    "error": f"payload inválido: {exc}"})
+            return Response(orjson.dumps({"results": results}), media_type="application/json")
+
+    @app.get("/stats")
+    async def stats() -> Response:
+        return Response(orjson.dumps(dict(config.stats)), media_type="application/json")
+
+    @app.post("/stats/reset")
+    async def stats_reset() -> Response:
+        config.stats.clear()
+        return Response(orjson.dumps({"status": "ok"}), media_type="application/json")
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.getenv("STUB_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("STUB_PORT", "8001")))
+    parser.add_argument("--latency", default=os.getenv("STUB_LATENCY", "const:0"))
+    parser.add_argument("--meta-latency", default=os.getenv("STUB_META_LATENCY", "const:0"))
+    parser.add_argument("--error-rate", type=float, default=float(os.getenv("STUB_ERROR_RATE", "0")))
+    parser.add_argument("--error-status", default=os.getenv("STUB_ERROR_STATUS", "500,503"),
+                        help="códigos HTTP sorteados nos erros injetados")
+    parser.add_argument("--pad-bytes", type=int, default=int(os.getenv("STUB_PAD_BYTES", "0")))
+    parser.add_argument("--model-version", default=os.getenv("STUB_MODEL_VERSION", "stub-1"))
+    parser.add_argument("--no-batch", action="store_true", help="não anuncia nem atende /predict/batch")
+    parser.add_argument("--no-columnar", action="store_true", help="só aceita histórico em registros")
+    parser.add_argument("--seed", type=int, default=None, help="semente do sorteio de latência/erros")
+    args = parser.parse_args()
+
+    for spec in (args.latency, args.meta_latency):
+        parse_distribution(spec)  # falha cedo com mensagem clara
+    config = StubConfig(
+        latency=args.latency,
+        meta_latency=args.meta_latency,
+        error_rate=args.error_rate,
+        error_status=tuple(int(s) for s in args.error_status.split(",") if s.strip()),
+        pad_bytes=args.pad_bytes,
+        model_version=args.model_version,
+        batch=not args.no_batch,
+        columnar=not args.no_columnar,
+        seed=args.seed,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning", access_log=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Configuração comum dos testes: o `app.py` fica na raiz do repositório."""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import app  # noqa: E402
+
+
+def ohlcv(n: int, end: str = "2024-12-31", seed: int = 0) -> pd.DataFrame:
+    """OHLCV sintético em dias úteis, no formato que os provedores devolvem."""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    idx = pd.bdate_range(end=end, periods=n, name="Date")
+    return pd.DataFrame(
+        {"Open": close * 0.99, "High": close * 1.01, "Low": close * 0.98, "Close": close, "Volume": rng.integers(1e6, 5e7, n).astype(float)},
+        index=idx,
+    )
+
+
+@pytest.fixture
+def raw_dir(tmp_path, monkeypatch):
+    """Cache de histórico em disco isolado por teste."""
+    monkeypatch.setattr(app, "RAW_DIR", str(tmp_path / "raw"))
+    return tmp_path / "raw"
+
+
+class FakeProvider(app.HistoryProvider):
+    """Dias úteis em [start, end); `empty` simula o yfinance falhando (frame vazio)."""
+
+    name = "fake"
+    empty = False
+    missing: set = set()
+
+    def __init__(self) -> None:
+        self.calls = []
+
+    def download(self, ticker, start, end, interval="1d", auto_adjust=False):
+        self.calls.append((ticker, start, end))
+        if self.empty or ticker in self.missing:
+            return pd.DataFrame()
+        idx = pd.bdate_range(start, pd.Timestamp(end) - pd.Timedelta(days=1), name="Date")
+        return pd.DataFrame({c: 1.0 for c in app.OHLCV_COLUMNS}, index=idx)
+
+    def download_many(self, tickers, start, end, interval="1d", auto_adjust=False):
+        return {t: self.download(t, start, end, interval, auto_adjust) for t in tickers if t not in self.missing}
+
+
+@pytest.fixture
+def provider(monkeypatch, raw_dir):
+    fake = FakeProvider()
+    monkeypatch.setitem(app.HISTORY_PROVIDERS, "fake", lambda: fake)
+    monkeypatch.setattr(FakeProvider, "empty", False)
+    monkeypatch.setattr(FakeProvider, "missing", set())
+    return fake
+
+
+def age_entry(ticker: str, drop_last: int = 3) -> pd.Timestamp:
+    """Deixa a entrada vencida (`fetched_at` = 0) e sem os últimos candles; devolve o último mantido."""
+    path = app.history_cache_path(ticker, provider="fake")
+    meta = app._read_cache_meta(path)
+    df = pd.read_parquet(path).iloc[:-drop_last]
+    app._write_history_cache(path, df, meta["start"], fetched_at=0.0)
+    return df.index.max()
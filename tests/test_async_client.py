@@ -0,0 +1,74 @@
+"""Cliente assíncrono: reenvio de 502/503/504 com o backoff do cliente síncrono."""
+import asyncio
+
+import httpx
+import pytest
+
+import app
+
+
+def _flaky(statuses, calls, headers=None):
+    """Transporte fake que responde `statuses` em sequência (o último se repete)."""
+
+    def handler(request):
+        status = statuses[min(len(calls), len(statuses) - 1)]
+        calls.append(request.url.path)
+        return httpx.Response(status, json={"ok": status == 200}, headers=headers or {})
+
+    return httpx.MockTransport(handler)
+
+
+@pytest.fixture
+def delays(monkeypatch):
+    slept = []
+
+    async def fake_sleep(seconds):
+        slept.append(seconds)
+
+    monkeypatch.setattr(app.asyncio, "sleep", fake_sleep)
+    return slept
+
+
+def _get(transport, path="/health"):
+    async def run():
+        async with httpx.AsyncClient(transport=transport) as client:
+            return await app._arequest(client, "GET", f"http://api{path}")
+
+    return asyncio.run(run())
+
+
+def test_retries_gateway_errors_with_backoff(delays):
+    calls = []
+    transport = app._StatusRetryTransport(_flaky([503, 502, 200], calls), max_retries=2, backoff_factor=0.3)
+
+    data, timing, err = _get(transport)
+
+    assert err is None and data == {"ok": True} and timing.status == 200
+    assert len(calls) == 3
+    assert delays == [0.0, 0.6]  # urllib3: 1º reenvio imediato, depois backoff_factor * 2**(n - 1)
+
+
+def test_gives_up_after_max_retries(delays):
+    calls = []
+    transport = app._StatusRetryTransport(_flaky([504], calls), max_retries=2, backoff_factor=0.3)
+
+    _, timing, err = _get(transport)
+
+    assert err and timing.status == 504
+    assert len(calls) == 3
+
+
+def test_other_statuses_are_not_retried(delays):
+    calls = []
+    transport = app._StatusRetryTransport(_flaky([500], calls), max_retries=2, backoff_factor=0.3)
+
+    assert _get(transport)[1].status == 500
+    assert len(calls) == 1 and delays == []
+
+
+def test_retry_after_is_respected(delays):
+    calls = []
+    transport = app._StatusRetryTransport(_flaky([503, 200], calls, {"Retry-After": "3"}), max_retries=2, backoff_factor=0.3)
+
+    assert _get(transport)[2] is None
+    assert delays == [3.0]
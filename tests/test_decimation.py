@@ -0,0 +1,78 @@
+"""Decimação de séries para os gráficos (LTTB e mín./máx. por bucket)."""
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import app
+from conftest import ohlcv
+
+
+@pytest.fixture
+def series():
+    rng = np.random.default_rng(0)
+    idx = pd.date_range("2020-01-01", periods=10_000, freq="h")
+    return pd.Series(np.cumsum(rng.normal(0, 1, len(idx))), index=idx)
+
+
+@pytest.mark.parametrize("n_out", [3, 10, 500])
+def test_lttb_keeps_endpoints_and_length(series, n_out):
+    x = np.arange(len(series), dtype="float64")
+    idx = app.lttb_indices(x, series.to_numpy(), n_out)
+
+    assert len(idx) == n_out
+    assert idx[0] == 0 and idx[-1] == len(series) - 1
+    assert np.all(np.diff(idx) > 0)
+
+
+def test_lttb_is_identity_within_budget():
+    y = np.arange(5, dtype="float64")
+    np.testing.assert_array_equal(app.lttb_indices(y, y, 10), np.arange(5))
+
+
+def test_minmax_keeps_extremes_and_endpoints(series):
+    idx = app.minmax_indices(series.to_numpy(), 200)
+
+    assert len(idx) <= 200
+    assert idx[0] == 0 and idx[-1] == len(series) - 1
+    assert series.iloc[idx].max() == series.max()
+    assert series.iloc[idx].min() == series.min()
+
+
+@pytest.mark.parametrize("method", ["lttb", "minmax"])
+def test_decimate_series_respects_budget(series, method):
+    out = app.decimate_series(series, max_points=300, method=method)
+    assert len(out) <= 300
+    assert out.index[0] == series.index[0] and out.index[-1] == series.index[-1]
+
+
+def test_decimate_series_is_noop_under_budget(series):
+    small = series.head(100)
+    pd.testing.assert_series_equal(app.decimate_series(small, max_points=300), small)
+
+
+def test_overview_covers_the_whole_file():
+    df = ohlcv(5000)
+    overview = app.CloseOverview(max_points=200)
+
+    tail = app.read_csv_tail(io.BytesIO(df.to_csv().encode()), keep=10, chunksize=400, overview=overview)
+
+    series = overview.series()
+    assert len(tail) == 10
+    assert len(series) == 200
+    assert series.index[0] == df.index[0] and series.index[-1] == df.index[-1]
+
+
+def test_lttb_uses_the_real_spacing_of_a_numeric_index(series):
+    # parciais de `CloseOverview` sem Date: posições no arquivo, com buracos irregulares
+    gaps = np.random.default_rng(1).integers(1, 400, len(series))
+    sparse = pd.Series(series.to_numpy(), index=np.cumsum(gaps))
+    y = sparse.to_numpy()
+
+    out = app.decimate_series(sparse, max_points=300, method="lttb")
+
+    expected = app.lttb_indices(sparse.index.to_numpy(dtype="float64"), y, 300)
+    uniform = app.lttb_indices(np.arange(len(y), dtype="float64"), y, 300)
+    assert not np.array_equal(expected, uniform)
+    np.testing.assert_array_equal(out.index, sparse.index[expected])
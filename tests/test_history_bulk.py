@@ -0,0 +1,17 @@
+"""Download em lote de vários tickers na camada de dados."""
+import app
+from conftest import age_entry
+
+
+def test_bulk_refresh_restamps_only_tickers_with_new_rows(provider):
+    app.fetch_history_bulk(["AAA", "BBB", "CCC"], 60, provider="fake")
+    for t in ("AAA", "BBB", "CCC"):
+        age_entry(t)
+    provider.missing = {"BBB"}
+
+    out = app.fetch_history_bulk(["AAA", "BBB", "CCC"], 60, provider="fake")
+
+    fresh = {t: app.is_cache_fresh(app._read_cache_meta(app.history_cache_path(t, provider="fake"))) for t in out}
+    assert fresh == {"AAA": True, "BBB": False, "CCC": True}
+    assert list(out) == ["AAA", "BBB", "CCC"]
+    assert not out["BBB"].empty  # continua servindo o que havia no cache
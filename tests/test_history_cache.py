@@ -0,0 +1,35 @@
+"""Validade e gravação do cache de histórico em disco."""
+import time
+
+import pandas as pd
+
+import app
+
+# Quarta-feira, 14/10/2026, 15:00 UTC (pregão de NY aberto); último fechamento: terça
+NOW = pd.Timestamp("2026-10-14 15:00", tz="UTC")
+
+
+def test_entry_within_ttl_is_fresh():
+    assert app.is_cache_fresh({"fetched_at": NOW.timestamp() - 60}, now=NOW)
+
+
+def test_daily_entry_fresh_only_if_fetched_after_last_close():
+    last_close = app.last_session_close(NOW)
+    assert last_close.tz_convert("America/New_York").date().isoformat() == "2026-10-13"
+    assert app.is_cache_fresh({"fetched_at": last_close.timestamp() + 1}, now=NOW)
+    assert not app.is_cache_fresh({"fetched_at": last_close.timestamp() - 1}, now=NOW)
+
+
+def test_intraday_entry_expires_with_ttl():
+    meta = {"fetched_at": NOW.timestamp() - app.YF_CACHE_TTL_SECONDS - 1}
+    assert not app.is_cache_fresh(meta, interval="1h", now=NOW)
+
+
+def test_cache_write_is_atomic_and_stamped(raw_dir):
+    path = app.history_cache_path("AAA", provider="fake")
+    path.parent.mkdir(parents=True)
+    t0 = time.time()
+    app._write_history_cache(path, pd.DataFrame({c: [1.0] for c in app.OHLCV_COLUMNS}), "2024-01-01")
+    meta = app._read_cache_meta(path)
+    assert meta["rows"] == 1 and meta["start"] == "2024-01-01" and meta["fetched_at"] >= t0
+    assert sorted(p.name for p in path.parent.iterdir()) == [path.with_suffix(".json").name, path.name]
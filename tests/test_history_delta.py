@@ -0,0 +1,46 @@
+"""Atualização incremental (delta) do cache de histórico."""
+from datetime import datetime
+
+import pandas as pd
+
+import app
+from conftest import age_entry
+
+
+def test_delta_downloads_only_the_tail_and_marks_fresh(provider):
+    app.load_history("AAA", 60, provider="fake")
+    last_kept = age_entry("AAA")
+    provider.calls.clear()
+
+    df = app.load_history("AAA", 60, provider="fake")
+
+    assert provider.calls == [("AAA", last_kept.date().isoformat(), datetime.now().date().isoformat())]
+    assert df.index.max() > last_kept
+    assert df.index.is_unique
+    assert app.is_cache_fresh(app._read_cache_meta(app.history_cache_path("AAA", provider="fake")))
+
+
+def test_failed_delta_keeps_entry_stale(provider):
+    app.load_history("AAA", 60, provider="fake")
+    last_kept = age_entry("AAA")
+    provider.empty = True
+
+    df = app.load_history("AAA", 60, provider="fake")
+
+    meta = app._read_cache_meta(app.history_cache_path("AAA", provider="fake"))
+    assert meta["fetched_at"] == 0.0
+    assert not app.is_cache_fresh(meta)
+    assert df.index.max() == last_kept
+
+
+def test_head_only_widening_keeps_fetched_at(provider):
+    app.load_history("AAA", 30, provider="fake")
+    path = app.history_cache_path("AAA", provider="fake")
+    before = app._read_cache_meta(path)
+
+    df = app.load_history("AAA", 90, provider="fake")
+
+    after = app._read_cache_meta(path)
+    assert after["fetched_at"] == before["fetched_at"]
+    assert after["start"] < before["start"]
+    assert df.index.min() < pd.Timestamp(before["start"])
@@ -0,0 +1,21 @@
+"""Validação dos argumentos do gerador de carga (`python app.py`)."""
+import pytest
+
+import app
+
+
+@pytest.mark.parametrize(
+    "argv",
+    [["--rate", "0"], ["--concurrency", "0"], ["--mode", "open", "--rate", "-5"], ["--duration", "0"], ["--warmup", "-1"]],
+)
+def test_non_positive_values_are_rejected(argv, monkeypatch, capsys):
+    monkeypatch.setattr(app, "api_health", lambda url: pytest.fail("não deveria chegar à API"))
+    with pytest.raises(SystemExit) as exc:
+        app.load_cli(argv)
+    assert exc.value.code == 2
+    assert "precisa ser" in capsys.readouterr().err
+
+
+def test_zero_warmup_is_accepted(monkeypatch):
+    monkeypatch.setattr(app, "api_health", lambda url: ({"status": "ok"}, app.RequestTiming(0.001), None))
+    assert app.load_cli(["--warmup", "0", "--health-only"]) == 0
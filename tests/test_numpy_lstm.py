@@ -0,0 +1,148 @@
+"""Motor NumPy (`NumpyLSTMModel`) contra uma LSTM de referência escrita passo a passo.
+
+O `.h5` é montado com h5py no mesmo layout que o Keras grava (`model_config` +
+`model_weights/<camada>/<peso>`), então o teste não depende do TensorFlow.
+"""
+import json
+
+import h5py
+import numpy as np
+import pytest
+
+import app
+from app import NumpyLSTMModel, extract_keras_h5
+
+F, U1, U2, H, T = 5, 8, 6, 5, 12
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def reference_lstm(x, kernel, recurrent, bias, return_sequences):
+    """LSTM de uma amostra, um passo por vez, gates na ordem do Keras: i, f, c, o."""
+    u = recurrent.shape[0]
+    h, c, seq = np.zeros(u), np.zeros(u), []
+    for t in range(x.shape[0]):
+        z = x[t] @ kernel + h @ recurrent + bias
+        i, f = _sigmoid(z[:u]), _sigmoid(z[u : 2 * u])
+        g, o = np.tanh(z[2 * u : 3 * u]), _sigmoid(z[3 * u :])
+        c = f * c + i * g
+        h = o * np.tanh(c)
+        seq.append(h)
+    return np.array(seq) if return_sequences else h
+
+
+def write_h5(path, weights, activation="tanh"):
+    layers = [
+        {"class_name": "InputLayer", "config": {"name": "input_1", "batch_input_shape": [None, T, F]}},
+        {"class_name": "LSTM", "config": {"name": "lstm", "units": U1, "return_sequences": True,
+                                          "activation": activation, "recurrent_activation": "sigmoid"}},
+        {"class_name": "Dropout", "config": {"name": "dropout", "rate": 0.2}},
+        {"class_name": "LSTM", "config": {"name": "lstm_1", "units": U2, "return_sequences": False,
+                                          "activation": "tanh", "recurrent_activation": "sigmoid"}},
+        {"class_name": "Dense", "config": {"name": "dense", "units": H, "activation": "linear"}},
+    ]
+    with h5py.File(path, "w") as f:
+        f.attrs["model_config"] = json.dumps({"class_name": "Sequential", "config": {"layers": layers}}).encode()
+        f.attrs["keras_version"] = b"2.15.0"
+        group = f.create_group("model_weights")
+        group.attrs["layer_names"] = [b"input_1", b"lstm", b"dropout", b"lstm_1", b"dense"]
+        for name in ("input_1", "dropout"):
+            group.create_group(name).attrs["weight_names"] = []
+        for name, ws in weights.items():
+            kinds = ("kernel", "recurrent_kernel", "bias") if name.startswith("lstm") else ("kernel", "bias")
+            prefix = f"{name}/lstm_cell/" if name.startswith("lstm") else f"{name}/"
+            wnames = [f"{prefix}{k}:0" for k in kinds]
+            layer = group.create_group(name)
+            layer.attrs["weight_names"] = [w.encode() for w in wnames]
+            for wname, w in zip(wnames, ws):
+                layer.create_dataset(wname, data=w.astype(np.float32))
+
+
+@pytest.fixture
+def weights():
+    rng = np.random.default_rng(0)
+    return {
+        "lstm": [rng.normal(0, 0.3, (F, 4 * U1)), rng.normal(0, 0.3, (U1, 4 * U1)), rng.normal(0, 0.1, 4 * U1)],
+        "lstm_1": [rng.normal(0, 0.3, (U1, 4 * U2)), rng.normal(0, 0.3, (U2, 4 * U2)), rng.normal(0, 0.1, 4 * U2)],
+        "dense": [rng.normal(0, 0.3, (U2, H)), rng.normal(0, 0.1, H)],
+    }
+
+
+def _reference(x, weights):
+    w32 = {k: [w.astype(np.float32).astype(np.float64) for w in ws] for k, ws in weights.items()}
+    seq = reference_lstm(x, *w32["lstm"], return_sequences=True)
+    h = reference_lstm(seq, *w32["lstm_1"], return_sequences=False)
+    return h @ w32["dense"][0] + w32["dense"][1]
+
+
+def test_forward_matches_reference(tmp_path, weights):
+    path = tmp_path / "model.h5"
+    write_h5(path, weights)
+    model = NumpyLSTMModel.from_h5(str(path))
+    x = np.random.default_rng(1).normal(0, 1, (7, T, F)).astype(np.float32)
+
+    out = model(x)
+
+    assert out.shape == (7, H)
+    expected = np.array([_reference(sample.astype(np.float64), weights) for sample in x])
+    np.testing.assert_allclose(out, expected, atol=1e-5)
+
+
+def test_return_sequences_keeps_every_step(tmp_path, weights):
+    path = tmp_path / "model.h5"
+    write_h5(path, weights)
+    model = NumpyLSTMModel.from_h5(str(path))
+    x = np.random.default_rng(2).normal(0, 1, (3, T, F)).astype(np.float32)
+
+    seq = model._lstm(x, model.layers[0])
+
+    assert seq.shape == (3, T, U1)
+    w = [v.astype(np.float32).astype(np.float64) for v in weights["lstm"]]
+    np.testing.assert_allclose(seq[1], reference_lstm(x[1].astype(np.float64), *w, True), atol=1e-5)
+
+
+def test_npz_export_is_reused(tmp_path, weights):
+    path = tmp_path / "model.h5"
+    write_h5(path, weights)
+    x = np.random.default_rng(3).normal(0, 1, (2, T, F)).astype(np.float32)
+
+    first = NumpyLSTMModel.from_h5(str(path))(x)
+    assert (tmp_path / "model.npz").exists()
+    second = NumpyLSTMModel.from_h5(str(path))(x)
+
+    np.testing.assert_array_equal(first, second)
+
+
+def test_unknown_activation_fails_at_extraction(tmp_path, weights):
+    path = tmp_path / "model.h5"
+    write_h5(path, weights, activation="swish")
+
+    with pytest.raises(ValueError, match="swish"):
+        extract_keras_h5(str(path))
+
+
+def test_read_only_model_dir_keeps_weights_in_memory(tmp_path, weights, monkeypatch):
+    path = tmp_path / "model.h5"
+    write_h5(path, weights)
+
+    def read_only(path, write):
+        raise PermissionError(30, "Read-only file system", str(path))
+
+    monkeypatch.setattr(app, "_atomic_write", read_only)
+    model = NumpyLSTMModel.from_h5(str(path))
+
+    assert not (tmp_path / "model.npz").exists()
+    assert model(np.zeros((1, T, F), dtype=np.float32)).shape[0] == 1
+
+
+def test_unsupported_layer_fails_with_value_error(tmp_path):
+    path = tmp_path / "model.h5"
+    layers = [{"class_name": "GRU", "config": {"name": "gru", "units": U1}}]
+    with h5py.File(path, "w") as f:
+        f.attrs["model_config"] = json.dumps({"class_name": "Sequential", "config": {"layers": layers}}).encode()
+        f.create_group("model_weights").attrs["layer_names"] = []
+
+    with pytest.raises(ValueError, match="GRU"):
+        extract_keras_h5(str(path))
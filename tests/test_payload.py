@@ -0,0 +1,130 @@
+"""Payload do /predict: formatos de histórico e conversões de ida e volta."""
+import asyncio
+
+import httpx
+import numpy as np
+import pytest
+
+import app
+from conftest import ohlcv
+
+
+@pytest.fixture
+def df():
+    return ohlcv(120)
+
+
+def test_payload_shape(df):
+    payload = app.build_payload_from_df(df, window=30, horizon=1, ticker="AMZN")
+    assert payload["ticker"] == "AMZN" and payload["window"] == 30 and payload["horizon"] == 1
+    assert len(payload["history"]) == 30
+    assert payload["history"][-1]["date"] == df.index[-1].strftime("%Y-%m-%d")
+
+
+def test_payload_values_match_the_frame(df):
+    payload = app.build_payload_from_df(df, window=30, horizon=1)
+    closes = [row["close"] for row in payload["history"]]
+    assert all(type(v) is float for v in closes)
+    np.testing.assert_array_equal(closes, df["Close"].tail(30).to_numpy())
+
+
+def test_columnar_payload_converts_back_to_records(df):
+    records = app.build_payload_from_df(df, window=60, horizon=5, ticker="AMZN")
+    columnar = app.build_payload_from_df(df, window=60, horizon=5, ticker="AMZN", history_format="columnar")
+
+    assert columnar["history_format"] == "columnar"
+    assert app.payload_to_records(columnar) == records
+
+
+def test_records_payload_is_left_unchanged(df):
+    records = app.build_payload_from_df(df, window=60, horizon=5)
+    assert app.payload_to_records(records) is records
+
+
+def test_negotiates_columnar_only_when_announced():
+    assert app.negotiate_history_format({"history_formats": ["records", "columnar"]}) == "columnar"
+    assert app.negotiate_history_format({"history_formats": ["records"]}) == "records"
+    assert app.negotiate_history_format(None) == "records"
+
+
+def test_fallback_to_records_only_on_format_rejection(monkeypatch, df):
+    payload = app.build_payload_from_df(df, window=10, horizon=1, history_format="columnar")
+    sent = []
+
+    def fake_predict(status):
+        def api_predict(api_url, p, body=None):
+            sent.append(p.get("history_format", "records"))
+            if p.get("history_format") == "columnar":
+                return None, app.RequestTiming(0.1, status=status), f"{status} Error"
+            return {"predictions": [1.0]}, app.RequestTiming(0.1, status=200), None
+        return api_predict
+
+    monkeypatch.setattr(app, "api_predict", fake_predict(422))
+    assert app.api_predict_with_fallback("http://api", payload)[2] is None
+    assert sent == ["columnar", "records"]
+
+    sent.clear()
+    monkeypatch.setattr(app, "api_predict", fake_predict(503))
+    assert app.api_predict_with_fallback("http://api", payload)[2] == "503 Error"
+    assert sent == ["columnar"]
+
+
+def _rejecting_transport(status, sent):
+    """API fake que recusa histórico colunar com `status` e aceita registros."""
+
+    def handler(request):
+        body = app.orjson.loads(request.content)
+        items = body if isinstance(body, list) else [body]
+        formats = [p.get("history_format", "records") for p in items]
+        sent.append(formats)
+        if "columnar" in formats:
+            return httpx.Response(status, json={"detail": "formato não suportado"})
+        results = [{"predictions": [1.0]} for _ in items]
+        return httpx.Response(200, json=results if isinstance(body, list) else results[0])
+
+    return httpx.MockTransport(handler)
+
+
+@pytest.mark.parametrize("status, retried", [(415, True), (503, False)])
+def test_async_predict_falls_back_only_on_format_rejection(df, status, retried):
+    payloads = [app.build_payload_from_df(df, window=10, horizon=1, history_format="columnar") for _ in range(3)]
+    sent = []
+
+    async def run():
+        async with httpx.AsyncClient(transport=_rejecting_transport(status, sent)) as client:
+            return await app.async_api_predict_many("http://api", payloads, concurrency=2, client=client)
+
+    results = asyncio.run(run())
+
+    assert all((err is None) == retried for _, _, err in results)
+    assert len(sent) == (6 if retried else 3)
+    assert sent.count(["records"]) == (3 if retried else 0)
+
+
+@pytest.mark.parametrize("status, retried", [(400, True), (504, False)])
+def test_batch_predict_falls_back_only_on_format_rejection(monkeypatch, df, status, retried):
+    payloads = [app.build_payload_from_df(df, window=10, horizon=1, history_format="columnar") for _ in range(3)]
+    sent = []
+    client = httpx.Client(transport=_rejecting_transport(status, sent))
+
+    def fake_request(method, url, *, body=None, timeout=15):
+        resp = client.request(method, url, content=body)
+        err = None if resp.is_success else f"{resp.status_code} Error"
+        return resp.json(), app.RequestTiming(0.1, status=resp.status_code), err
+
+    monkeypatch.setattr(app, "_request", fake_request)
+    data, _, err = app.api_predict_batch("http://api", "/predict/batch", payloads)
+
+    assert (err is None) == retried
+    assert sent == ([["columnar"] * 3, ["records"] * 3] if retried else [["columnar"] * 3])
+
+
+@pytest.mark.parametrize("history_format", ["records", "columnar"])
+def test_payload_history_frame_round_trip(df, history_format):
+    payload = app.build_payload_from_df(df, window=60, horizon=5, history_format=history_format)
+
+    back = app.payload_history_frame(payload)
+
+    assert list(back.columns) == list(app.OHLCV_COLUMNS)
+    np.testing.assert_allclose(back.to_numpy(), df.tail(60).to_numpy())
+    assert (back.index == df.tail(60).index).all()
@@ -0,0 +1,27 @@
+"""Cache de respostas do /predict (LRU em memória + JSON em disco por versão do modelo)."""
+import app
+
+
+def test_versions_share_the_memory_tier(tmp_path):
+    cache = app.PredictionCache(maxsize=8, root=str(tmp_path))
+    cache.put("k1", "v1", {"predictions": [1.0]})
+    cache.put("k2", "v2", {"predictions": [2.0]})
+    for path in tmp_path.rglob("*.json"):
+        path.unlink()  # só a memória pode responder
+
+    # duas sessões em APIs com versões diferentes, alternando: nenhuma apaga a outra
+    assert cache.get("k1", "v1") == {"predictions": [1.0]}
+    assert cache.get("k2", "v2") == {"predictions": [2.0]}
+    assert cache.get("k1", "v1") == {"predictions": [1.0]}
+
+
+def test_disk_tier_is_per_version_and_expires(tmp_path):
+    cache = app.PredictionCache(maxsize=8, root=str(tmp_path))
+    cache.put("k", "v1", {"predictions": [1.0]})
+
+    fresh = app.PredictionCache(maxsize=8, root=str(tmp_path))
+    assert fresh.get("k", "v1") == {"predictions": [1.0]}
+    assert fresh.get("k", "v2") is None
+
+    expired = app.PredictionCache(maxsize=8, root=str(tmp_path), max_age=-1)
+    assert expired.get("k", "v1") is None
@@ -0,0 +1,44 @@
+"""Cache de faixa em memória (superset) na frente do cache em disco."""
+import pytest
+
+import app
+from conftest import age_entry
+
+
+@pytest.fixture(autouse=True)
+def range_cache(monkeypatch):
+    """`HistoryRangeCache` novo por teste, no lugar do singleton do processo."""
+    cache = app.HistoryRangeCache()
+    monkeypatch.setattr(app, "history_range_cache", lambda: cache)
+    return cache
+
+
+def test_range_cache_keeps_source_fetched_at(provider):
+    app.load_history("AAA", app.HISTORY_MIN_DAYS, provider="fake")
+    age_entry("AAA")
+    provider.empty = True
+    provider.calls.clear()
+
+    app.fetch_history_yf("AAA", 100, provider="fake")
+    app.fetch_history_yf("AAA", 100, provider="fake")
+
+    assert len(provider.calls) == 2  # vencida no disco continua vencida em memória: tenta de novo
+
+
+def test_range_cache_does_not_keep_empty_results(provider):
+    provider.empty = True
+
+    assert app.fetch_history_yf("ZZZ", 100, provider="fake").empty
+    provider.empty = False
+    assert not app.fetch_history_yf("ZZZ", 100, provider="fake").empty
+
+
+def test_narrower_window_is_sliced_from_memory(provider):
+    wide = app.fetch_history_yf("AAA", 400, provider="fake")
+    provider.calls.clear()
+
+    narrow = app.fetch_history_yf("AAA", 100, provider="fake")
+
+    assert provider.calls == []
+    assert narrow.index.max() == wide.index.max()
+    assert narrow.index.min() >= wide.index.min()
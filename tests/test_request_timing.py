@@ -0,0 +1,26 @@
+"""`RequestTiming`: fases, metadados da resposta e a recriação usada pelo gerador de carga."""
+import app
+
+
+def test_as_dict_round_trips_every_field():
+    timing = app.RequestTiming(
+        0.25, True, bytes_out=10, bytes_in=20, status=503, connect=0.01, ttfb=0.2, download=0.03
+    )
+
+    fields = timing.as_dict()
+    total = fields.pop("total")
+    again = app.RequestTiming(total, **fields)
+
+    assert again.as_dict() == timing.as_dict()
+    assert fields["status"] == 503 and fields["reused_connection"] is True
+
+
+def test_load_samples_keep_status(monkeypatch):
+    def fake_request(method, url, *, body=None, timeout=15, session=None):
+        return None, app.RequestTiming(0.001, status=502, ttfb=0.001), "502 Server Error"
+
+    monkeypatch.setattr(app, "_request", fake_request)
+    samples = app.run_load("http://api/predict", [b"{}"], mode="closed", concurrency=2, warmup=0.0, duration=0.05)
+
+    assert samples
+    assert all(t.status == 502 and float(t) >= t.ttfb for _, t, _ in samples)
@@ -0,0 +1,83 @@
+"""Coalescência de chamadas idênticas em andamento (`SingleFlight`)."""
+import threading
+import time
+
+import pytest
+
+import app
+
+N_THREADS = 8
+
+
+def _run_concurrently(sf, key, fn):
+    """Dispara `N_THREADS` chamadas de `sf.do(key, fn)` juntas; devolve resultados e exceções."""
+    results, errors = [], []
+    barrier = threading.Barrier(N_THREADS)
+
+    def worker():
+        barrier.wait()
+        try:
+            results.append(sf.do(key, fn))
+        except Exception as exc:  # noqa: BLE001
+            errors.append(exc)
+
+    threads = [threading.Thread(target=worker) for _ in range(N_THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=10)
+    return results, errors
+
+
+def _slow(calls, value=None, error=None):
+    def fn():
+        calls.append(threading.get_ident())
+        time.sleep(0.2)  # tempo para todas as threads chegarem enquanto a chamada está em voo
+        if error is not None:
+            raise error
+        return value if value is not None else object()
+    return fn
+
+
+def test_identical_calls_share_one_execution():
+    sf, calls = app.SingleFlight(), []
+
+    results, errors = _run_concurrently(sf, ("GET", "/metadata"), _slow(calls))
+
+    assert not errors
+    assert len(calls) == 1
+    assert len(results) == N_THREADS and all(r is results[0] for r in results)
+
+
+def test_leader_error_reaches_every_caller():
+    sf, calls = app.SingleFlight(), []
+
+    results, errors = _run_concurrently(sf, ("k",), _slow(calls, error=RuntimeError("falhou")))
+
+    assert len(calls) == 1 and not results
+    assert len(errors) == N_THREADS and all(str(e) == "falhou" for e in errors)
+
+
+def test_different_keys_are_not_coalesced():
+    sf, calls = app.SingleFlight(), []
+    threads = [threading.Thread(target=sf.do, args=((i,), _slow(calls))) for i in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=10)
+    assert len(calls) == 3
+
+
+def test_nothing_is_kept_after_the_call():
+    sf = app.SingleFlight()
+    counter = iter(range(10))
+    assert sf.do(("k",), lambda: next(counter)) == 0
+    assert sf.do(("k",), lambda: next(counter)) == 1
+    assert sf._flights == {}
+
+
+def test_failed_leader_does_not_block_next_call():
+    sf = app.SingleFlight()
+    with pytest.raises(ValueError):
+        sf.do(("k",), lambda: (_ for _ in ()).throw(ValueError("x")))
+    assert sf.do(("k",), lambda: "ok") == "ok"
@@ -0,0 +1,101 @@
+"""Leitura de uploads em streaming: só a cauda fica em memória."""
+import io
+import zipfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import app
+from conftest import ohlcv
+
+
+def _csv(df: pd.DataFrame, **kwargs) -> io.BytesIO:
+    return io.BytesIO(df.to_csv(**kwargs).encode())
+
+
+@pytest.mark.parametrize("chunksize", [app.UPLOAD_CHUNK_ROWS, 7])
+def test_csv_reader_keeps_only_the_tail(chunksize):
+    df = ohlcv(1000)
+
+    tail = app.read_csv_tail(_csv(df), keep=60, chunksize=chunksize)
+
+    pd.testing.assert_frame_equal(tail, df.tail(60), check_freq=False, check_exact=False)
+
+
+def test_tail_uses_latest_dates_when_file_is_out_of_order():
+    df = ohlcv(300)
+    shuffled = df.sample(frac=1.0, random_state=1)
+
+    tail = app.read_csv_tail(_csv(shuffled), keep=20, chunksize=50)
+
+    pd.testing.assert_frame_equal(tail, df.tail(20), check_freq=False, check_exact=False)
+
+
+def test_without_date_keeps_last_rows_of_the_file():
+    df = ohlcv(100)
+    tail = app.read_csv_tail(_csv(df.reset_index(drop=True), index=False), keep=10, chunksize=30)
+    np.testing.assert_allclose(tail["Close"].to_numpy(), df["Close"].tail(10).to_numpy())
+
+
+def test_column_names_are_case_insensitive():
+    df = ohlcv(50)
+    lower = df.rename(columns=str.lower).rename_axis("date")
+    tail = app.read_ohlcv_tail(_csv(lower), "x.csv", keep=5)
+    assert list(tail.columns) == list(app.OHLCV_COLUMNS)
+    assert tail.index[-1] == df.index[-1]
+
+
+def test_missing_columns_raise():
+    with pytest.raises(app.MissingColumnsError):
+        app.read_ohlcv_tail(io.BytesIO(b"Date,Close\n2024-01-02,1\n"), "x.csv", keep=5)
+
+
+def test_arrow_csv_reader_keeps_only_the_tail():
+    df = ohlcv(1000)
+
+    tail = app.read_csv_tail_arrow(_csv(df), keep=60)
+
+    pd.testing.assert_frame_equal(tail, df.tail(60), check_freq=False, check_exact=False)
+
+
+@pytest.mark.parametrize("suffix", [".parquet", ".feather"])
+def test_columnar_formats(suffix):
+    df = ohlcv(500)
+    buf = io.BytesIO()
+    if suffix == ".parquet":
+        df.to_parquet(buf)
+    else:
+        df.reset_index().to_feather(buf)
+    buf.seek(0)
+
+    tail = app.read_ohlcv_tail(buf, f"x{suffix}", keep=30)
+
+    pd.testing.assert_frame_equal(tail, df.tail(30), check_freq=False, check_exact=False)
+
+
+def test_zip_upload_reports_duplicates_and_bad_members():
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("AAA.csv", ohlcv(100).to_csv())
+        zf.writestr("sub/aaa.csv", ohlcv(100, seed=1).to_csv())
+        zf.writestr("BBB.csv", ohlcv(100, seed=2).to_csv())
+        zf.writestr("bad.csv", "x,y\n1,2\n")
+    buf.name = "lote.zip"
+    buf.seek(0)
+
+    frames, errors = app.parse_uploads([buf], keep=20, workers=2)
+
+    assert sorted(frames) == ["AAA", "BBB"]
+    assert all(len(df) == 20 for df in frames.values())
+    assert "repetido" in errors["sub/aaa.csv"]
+    assert "bad.csv" in errors
+
+
+def test_server_uploads_list_only_supported_files(tmp_path):
+    (tmp_path / "sub").mkdir()
+    for name in ("AAA.csv", "sub/BBB.parquet", "notas.txt", ".oculto.csv"):
+        (tmp_path / name).write_bytes(b"")
+
+    assert app.list_server_uploads(str(tmp_path)) == ["AAA.csv", "sub/BBB.parquet"]
+    assert app.list_server_uploads(str(tmp_path / "nao-existe")) == []